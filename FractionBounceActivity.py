@@ -17,6 +17,7 @@ import os
 
 import gi
 gi.require_version('Gtk', '3.0')
+from gi.repository import GLib
 from gi.repository import Gtk
 from gi.repository import Gdk
 
@@ -31,15 +32,15 @@ from sugar3.graphics.radiotoolbutton import RadioToolButton
 from sugar3.graphics.alert import NotifyAlert
 from sugar3.graphics import style
 
-from collabwrapper import CollabWrapper
-
 from gettext import gettext as _
 
 import logging
 _logger = logging.getLogger('fractionbounce-activity')
 
-from utils import chooser
-from svg_utils import svg_str_to_pixbuf, generate_xo_svg
+from utils import chooser, get_colors
+from surfacecache import surface_cache
+from assets import assets
+from svg_utils import svg_str_to_pixbuf, generate_xo_svg, raster_cache
 
 from bounce import Bounce
 from aplay import aplay
@@ -66,10 +67,7 @@ class FractionBounceActivity(activity.Activity):
 
         self.nick = profile.get_nick_name()
         self.key = profile.get_pubkey()
-        if profile.get_color() is not None:
-            self._colors = profile.get_color().to_string().split(',')
-        else:
-            self._colors = ['#A0FFA0', '#FF8080']
+        self._colors = get_colors()[:]
 
         self.max_participants = 4  # sharing
         self._ignore_messages = False  # activity was asked to stop
@@ -87,8 +85,21 @@ class FractionBounceActivity(activity.Activity):
 
         self._toolbar_was_expanded = False
 
+        # Rendered graphics are kept on disk between launches
+        surface_cache.set_path(
+            os.path.join(activity.get_activity_root(), 'data', 'surfaces'))
+        # and so are the images and icons, in one file
+        assets.load(activity.get_bundle_path(),
+                    os.path.join(activity.get_activity_root(), 'data',
+                                 'assets.manifest'))
+
         # Initialize the canvas
         self._bounce_window = Bounce(canvas, activity.get_bundle_path(), self)
+        # and the rest of the backgrounds and balls once it is up
+        self._bounce_window.preload(
+            [BGDICT[bg][1] for bg in BGDICT if BGDICT[bg][1] is not None],
+            [os.path.join(activity.get_bundle_path(), 'images', ball + '.svg')
+             for ball in BALLDICT if ball != 'custom'])
 
         Gdk.Screen.get_default().connect('size-changed', self._configure_cb)
 
@@ -117,6 +128,16 @@ class FractionBounceActivity(activity.Activity):
 
         self.connect('shared', on_activity_shared_cb)
 
+        # Collaboration (Telepathy) is only started right away when we
+        # are joining; otherwise it waits until the activity is up.
+        self._collab = None
+        if self.shared_activity:
+            self._setup_collab()
+        else:
+            GLib.idle_add(self._setup_collab)
+
+    def _setup_collab(self):
+        from collabwrapper import CollabWrapper
         self._collab = CollabWrapper(self)
 
         if self.shared_activity:
@@ -162,6 +183,7 @@ class FractionBounceActivity(activity.Activity):
         self._collab.connect('buddy_left', on_buddy_left_cb, 'buddy_left')
 
         self._collab.setup()
+        return False
 
     def set_data(self, blob):
         pass
@@ -172,6 +194,7 @@ class FractionBounceActivity(activity.Activity):
     def close(self, **kwargs):
         self._bounce_window.pause()
         aplay.close()
+        _logger.debug('SVG raster cache: %r', raster_cache.stats())
         activity.Activity.close(self, **kwargs)
 
     def _configure_cb(self, event):
@@ -416,13 +439,15 @@ class FractionBounceActivity(activity.Activity):
 
     def _load_bg_cb(self, widget, event, bg):
         if bg == 'custom':
-            chooser(self, 'Image', self._new_background_from_journal)
+            chooser(self, 'Image', self._new_background_from_journal,
+                    self._bounce_window.pause, self._bounce_window.resume)
         else:
             self._bounce_window.set_background(BGDICT[bg][1])
 
     def _load_ball_cb(self, widget, event, ball):
         if ball == 'custom':
-            chooser(self, 'Image', self._new_ball_from_journal)
+            chooser(self, 'Image', self._new_ball_from_journal,
+                    self._bounce_window.pause, self._bounce_window.resume)
         else:
             self._bounce_window.ball.new_ball(os.path.join(
                 activity.get_bundle_path(), 'images', ball + '.svg'))
@@ -441,9 +466,7 @@ class FractionBounceActivity(activity.Activity):
 
     def _new_ball_from_journal(self, dsobject):
         ''' Load an image from the Journal. '''
-        self._bounce_window.ball.new_ball_from_image(
-            dsobject.file_path,
-            os.path.join(activity.get_activity_root(), 'tmp', 'custom.png'))
+        self._bounce_window.ball.new_ball_from_image(dsobject.file_path)
 
     def _new_background_from_journal(self, dsobject):
         ''' Load an image from the Journal. '''
@@ -462,6 +485,7 @@ class FractionBounceActivity(activity.Activity):
     def _sector_cb(self, arg=None):
         ''' Set sector mode '''
         self._bounce_window.mode = 'sectors'
+        self._bounce_window.prepare_sectors()
 
     def _add_fraction_cb(self, arg=None):
         ''' Read entries and add a fraction to the list '''
@@ -17,16 +17,28 @@
 
 import logging
 from queue import Queue
-import gi
-gi.require_version('Gst', '1.0')
-from gi.repository import Gst
 
+Gst = None  # GStreamer is imported, and initialised, on first use
 
-Gst.init(None)
+
+def _init_gst():
+    global Gst
+    if Gst is None:
+        import gi
+        gi.require_version('Gst', '1.0')
+        from gi.repository import Gst as _Gst
+        _Gst.init(None)
+        Gst = _Gst
 
 
 class Aplay:
     def __init__(self):
+        self._pipeline = None
+        self._closed = False
+        self._queue = Queue()
+
+    def _make_pipeline(self):
+        _init_gst()
         pipeline = Gst.ElementFactory.make('playbin', 'playbin')
         pipeline.set_property(
             "video-sink",
@@ -38,7 +50,6 @@ class Aplay:
         bus.connect('message::error', self._on_message_error)
 
         self._pipeline = pipeline
-        self._queue = Queue()
 
     def _dequeue(self):
         if self._queue.empty():
@@ -58,15 +69,26 @@ class Aplay:
         self._pipeline.set_state(Gst.State.NULL)
         self._dequeue()
 
+    def warm_up(self):
+        ''' Start GStreamer and make the pipeline before the first sound
+        is needed; returns False, so it can be an idle callback '''
+        if self._pipeline is None and not self._closed:
+            self._make_pipeline()
+        return False
+
     def play(self, name):
         self._queue.put(name)
+        if self._pipeline is None and not self._closed:
+            self._make_pipeline()
         if self._pipeline:
             if self._pipeline.get_state(Gst.CLOCK_TIME_NONE)[1] == Gst.State.NULL:
                 self._dequeue()
 
     def close(self):
-        self._pipeline.set_state(Gst.State.NULL)
+        if self._pipeline is not None:
+            self._pipeline.set_state(Gst.State.NULL)
         self._pipeline = None
+        self._closed = True
 
 
 aplay = Aplay()
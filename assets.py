@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2026, FractionBounce contributors
+
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# You should have received a copy of the GNU General Public License
+# along with this library; if not, write to the Free Software
+# Foundation, 51 Franklin Street, Suite 500 Boston, MA 02110-1335 USA
+
+'''
+assets.py reads the files in the images/ directory of the bundle once,
+and hands out memoryviews of their contents (and of the payload of SVG
+files: everything between <svg ...> and </svg>).
+
+The contents of the directory can also be kept in a manifest: a
+single file holding a JSON index followed by the data of every asset,
+so that a later launch reads all of them at once.
+'''
+
+import os
+import json
+import struct
+
+import logging
+_logger = logging.getLogger('fractionbounce-activity')
+
+DIRECTORIES = ['images']
+MAGIC = b'FBA1'
+HEADER = struct.Struct('<4si')  # magic, length of the JSON index
+
+
+class AssetManager():
+    ''' The contents of the asset files, keyed by path '''
+
+    def __init__(self):
+        self._path = None
+        self._files = {}  # path -> memoryview of the file
+        self._payloads = {}  # path -> memoryview of the SVG payload
+
+    def load(self, path, manifest=None):
+        ''' Read the assets of the bundle at path, from the manifest if
+        it is up to date, and otherwise from the files (and then save
+        the manifest for next time) '''
+        self._path = path
+        stamp = self._stamp()
+        if manifest is not None and self._load_manifest(manifest, stamp):
+            return
+        for directory in DIRECTORIES:
+            try:
+                names = sorted(os.listdir(os.path.join(path, directory)))
+            except OSError:
+                continue
+            for name in names:
+                filename = os.path.join(path, directory, name)
+                if os.path.isfile(filename):
+                    self.read(filename)
+        if manifest is not None:
+            self._save_manifest(manifest, stamp)
+
+    def read(self, filename):
+        ''' Return the contents of a file '''
+        if filename not in self._files:
+            with open(filename, 'rb') as fd:
+                self._files[filename] = memoryview(fd.read())
+        return self._files[filename]
+
+    def svg_payload(self, filename):
+        ''' Return everything between <svg ...> and </svg> in a file '''
+        if filename not in self._payloads:
+            data = self.read(filename)
+            raw = data.tobytes()
+            start = raw.find(b'<svg')
+            if start >= 0:
+                start = raw.find(b'>', start) + 1
+            if start <= 0:
+                payload = data[0:0]
+            else:
+                end = raw.find(b'</svg>', start)
+                if end < 0:
+                    end = len(raw)
+                payload = data[start:end]
+            self._payloads[filename] = payload
+        return self._payloads[filename]
+
+    def _stamp(self):
+        # The name, size and modification time of every asset, since
+        # editing a file in place does not change its directory's
+        # modification time.  Lists, not tuples, so that the stamp
+        # compares equal to the one read back from the JSON index.
+        stamp = [self._path]
+        for directory in DIRECTORIES:
+            files = []
+            try:
+                with os.scandir(os.path.join(self._path, directory)) as it:
+                    for entry in it:
+                        if entry.is_file():
+                            st = entry.stat()
+                            files.append([entry.name, st.st_size,
+                                          st.st_mtime_ns])
+            except OSError:
+                files = None
+            stamp.append(sorted(files) if files is not None else None)
+        return stamp
+
+    def _load_manifest(self, manifest, stamp):
+        try:
+            with open(manifest, 'rb') as fd:
+                data = memoryview(fd.read())
+            magic, length = HEADER.unpack_from(data)
+            if magic != MAGIC:
+                raise ValueError('bad header')
+            index = json.loads(
+                data[HEADER.size:HEADER.size + length].tobytes().decode())
+        except (OSError, ValueError, struct.error) as e:
+            _logger.debug('Could not load asset manifest %s: %s' %
+                          (manifest, e))
+            return False
+        if index['stamp'] != stamp:
+            return False
+        data = data[HEADER.size + length:]
+        for name, (offset, size) in index['files'].items():
+            self._files[os.path.join(self._path, name)] = \
+                data[offset:offset + size]
+        return True
+
+    def _save_manifest(self, manifest, stamp):
+        files = {}
+        offset = 0
+        for filename, data in self._files.items():
+            name = os.path.relpath(filename, self._path)
+            if name.split(os.sep)[0] not in DIRECTORIES:
+                continue
+            files[name] = (offset, len(data))
+            offset += len(data)
+        index = json.dumps({'stamp': stamp, 'files': files}).encode()
+        # Write to a temporary file and rename it, so another instance
+        # never reads a half-written manifest.
+        tmp = '%s.%d' % (manifest, os.getpid())
+        try:
+            os.makedirs(os.path.dirname(manifest), exist_ok=True)
+            with open(tmp, 'wb') as fd:
+                fd.write(HEADER.pack(MAGIC, len(index)))
+                fd.write(index)
+                for name in files:
+                    fd.write(self._files[os.path.join(self._path, name)])
+            os.replace(tmp, manifest)
+        except OSError as e:
+            _logger.error('Could not save asset manifest %s: %s' %
+                          (manifest, e))
+
+
+assets = AssetManager()
@@ -14,23 +14,24 @@
 # along with this library; if not, write to the Free Software
 # Foundation, 51 Franklin Street, Suite 500 Boston, MA 02110-1335 USA
 
-from math import pi
+from math import ceil, pi
 
-from gi.repository import GdkPixbuf
+import cairo
+
+from gi.repository import Gdk
 
 from sprites import Sprite
-from svg_utils import (svg_header, svg_footer, svg_str_to_pixbuf, svg_rect,
-                       extract_svg_payload, svg_from_file, svg_sector,
-                       generate_ball_svg)
+from svg_utils import (svg_header, svg_footer, color_to_rgb,
+                       svg_str_to_surface)
+from assets import assets
+from utils import LRUCache, get_colors
 
 import logging
 _logger = logging.getLogger('fractionbounce-activity')
 
-from sugar3 import profile
-COLORS = profile.get_color().to_string().split(',')
-
 SIZE = [85, 120]
 BOX = [85, 32]
+SECTOR_CACHE_SIZE = 64  # number of sector balls to keep
 
 ANIMATION = {10: (0, 1), 15: (1, 2), 20: (2, 1), 25: (1, 2), 30: (2, 1),
              35: (1, 2), 40: (2, 3), 45: (3, 4), 50: (4, 3), 55: (3, 4),
@@ -89,73 +90,177 @@ stroke-miterlimit:4" />\
   </g>'
 
 
+def _paint_sector(cr, x, y, r, a, fill, stroke):
+    ''' Paints the path svg_utils.svg_sector describes, without SVG '''
+    cr.move_to(x, y)
+    cr.line_to(x, y - r)
+    cr.arc_negative(x, y, r, -pi / 2, -pi / 2 - a)
+    cr.close_path()
+    cr.set_source_rgb(*color_to_rgb(fill))
+    cr.fill_preserve()
+    cr.set_source_rgb(*color_to_rgb(stroke))
+    cr.stroke()
+
+
+def _render_sector_ball(fraction, colors, size):
+    ''' Render a ball with a sector of size fraction '''
+    surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, size[0], size[1])
+    cr = cairo.Context(surface)
+    cr.set_line_width(1)
+    r = size[0] / 2.0
+    _paint_sector(cr, r, r + BOX[1], r - 1, 1.999 * pi, colors[0], colors[1])
+    _paint_sector(cr, r, r + BOX[1], r - 1, fraction * 2 * pi,
+                  colors[1], colors[0])
+    _paint_box(cr, BOX[0], BOX[1], 4)
+    surface.flush()
+    return surface
+
+
+def _fill_ball(width, height):
+    ''' The size that just covers the ball with a width x height image '''
+    scale = SIZE[0] / float(min(width, height))
+    return (max(SIZE[0], int(ceil(width * scale))),
+            max(SIZE[0], int(ceil(height * scale))))
+
+
+def _render_image_ball(stream, cancellable=None):
+    ''' Render a ball from an image: the middle of the image, scaled to
+    fit, below the white box behind the label (in the image loader's
+    worker thread) '''
+    from imageloader import decode
+    # Decode no more of the image than the ball shows.
+    pixbuf = decode(stream, _fill_ball, cancellable)
+    pixbuf = pixbuf.new_subpixbuf(
+        (pixbuf.get_width() - SIZE[0]) // 2,
+        (pixbuf.get_height() - SIZE[0]) // 2, SIZE[0], SIZE[0])
+    surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, SIZE[0], SIZE[1])
+    cr = cairo.Context(surface)
+    Gdk.cairo_set_source_pixbuf(cr, pixbuf, 0, SIZE[1] - SIZE[0])
+    cr.paint()
+    _paint_box(cr, SIZE[0], SIZE[1] - SIZE[0], 7.75)
+    surface.flush()
+    return surface
+
+
+def _paint_box(cr, w, h, r):
+    ''' Paints the white box behind the label, with corners of radius r '''
+    cr.new_sub_path()
+    cr.arc(w - r, r, r, -pi / 2, 0)
+    cr.arc(w - r, h - r, r, 0, pi / 2)
+    cr.arc(r, h - r, r, pi / 2, pi)
+    cr.arc(r, r, r, pi, 3 * pi / 2)
+    cr.close_path()
+    cr.set_source_rgb(1, 1, 1)
+    cr.fill()
+
+
 class Ball():
     ''' The Bounce class is used to define the ball and the user
     interaction. '''
 
     def __init__(self, sprites, filename):
         self._current_frame = 0
-        self._frames = []  # Easter Egg animation
+        # The Easter Egg animation is only drawn the first time it is
+        # needed: one sprite sheet per ball, shown a frame at a time.
+        self._frames = None
+        self._sheets = {}
+        self._filename = filename
         self._sprites = sprites
-        self.ball = Sprite(self._sprites, 0, 0, svg_str_to_pixbuf(
-            svg_from_file(filename)))
+        self._placeholder = None  # shown while an image is loading
+        self._before_placeholder = None
+        self._loading = False  # an image is being loaded for the ball
+        self._balls = LRUCache()  # filename: surface
+        self._sectors = LRUCache(size=SECTOR_CACHE_SIZE)
+        self.ball = Sprite(self._sprites, 0, 0, self._get_ball(filename))
 
         self.ball.set_layer(3)
         self.ball.set_label_attributes(24, vert_align='top')
 
-        ball = extract_svg_payload(open(filename, 'r'))
-        for i in range(8):
-            self._frames.append(Sprite(
-                self._sprites, 0, 0, svg_str_to_pixbuf(
-                    svg_header(SIZE[0], SIZE[1], 1.0) + TRANSFORMS[i] +
-                    ball + PUNCTURE + AIR + '</g>' + svg_footer())))
-
-        for frame in self._frames:
-            frame.set_layer(3)
-            frame.move((0, -SIZE[1]))  # move animation frames off screen
-
     def new_ball(self, filename):
-        ''' Create a ball object and Easter Egg animation from an SVG file. '''
-        self.ball.set_shape(svg_str_to_pixbuf(svg_from_file(filename)))
-        ball = extract_svg_payload(open(filename, 'r'))
-        for i in range(8):
-            self._frames[i].set_shape(svg_str_to_pixbuf(
-                svg_header(SIZE[0], SIZE[1], 1.0) + TRANSFORMS[i] +
-                ball + PUNCTURE + AIR + '</g>' + svg_footer()))
-
-    def new_ball_from_image(self, filename, save_path):
+        ''' Create a ball object (and, when it is first needed, an Easter
+        Egg animation) from an SVG file. '''
+        self._stop_loading()
+        self.ball.set_shape(self._get_ball(filename))
+        self._filename = filename
+
+    def _get_ball(self, filename):
+        return self._balls.get(
+            filename, lambda: svg_str_to_surface(assets.read(filename)))
+
+    def prepare_balls(self, filenames):
+        ''' Render, in the background, any of the balls from the given
+        SVG files that are not ready yet '''
+        for filename in filenames:
+            self._balls.prefill(filename, svg_str_to_surface,
+                                assets.read(filename))
+
+    def _frame_sheet(self):
+        ''' Return the Easter Egg animation of the current ball: the
+        frames side by side in one surface '''
+        if self._filename not in self._sheets:
+            ball = assets.svg_payload(self._filename)
+            # Some TRANSFORMS reach past the edges of a frame, so each
+            # frame is clipped to its own cell of the sheet.
+            svg = [(svg_header(SIZE[0] * len(TRANSFORMS), SIZE[1], 1.0) +
+                    '<defs><clipPath id="frame"><rect width="%d" '
+                    'height="%d"/></clipPath></defs>' % tuple(SIZE)).encode()]
+            for i in range(len(TRANSFORMS)):
+                svg += [('<g transform="translate(%d,0)" '
+                         'clip-path="url(#frame)">' % (i * SIZE[0]) +
+                         TRANSFORMS[i]).encode(), ball,
+                        (PUNCTURE + AIR + '</g></g>').encode()]
+            svg.append(svg_footer().encode())
+            self._sheets[self._filename] = svg_str_to_surface(b''.join(svg))
+        return self._sheets[self._filename]
+
+    def new_ball_from_image(self, filename):
         ''' Just create a ball object from an image file '''
         if filename == '':
             _logger.debug('Image file not found.')
             return
-        try:
-            pixbuf = GdkPixbuf.Pixbuf.new_from_file(filename)
-            if pixbuf.get_width() > pixbuf.get_height():
-                size = pixbuf.get_height()
-                x = int((pixbuf.get_width() - size) // 2)
-            else:
-                size = pixbuf.get_width()
-                x = int((pixbuf.get_height() - size) // 2)
-            crop = GdkPixbuf.Pixbuf.new(0, True, 8, size, size)
-            pixbuf.copy_area(x, 0, size, size, crop, 0, 0)
-            scale = crop.scale_simple(85, 85, GdkPixbuf.InterpType.BILINEAR)
-            scale.savev(save_path, 'png', [], [])
-            self.ball.set_shape(
-                svg_str_to_pixbuf(generate_ball_svg(save_path)))
-        except Exception as e:
-            _logger.error('Could not load image from %s: %s' % (filename, e))
+        from imageloader import image_loader
+        if not image_loader.load('ball', filename, _render_image_ball,
+                                 lambda surface: self._image_loaded(
+                                     surface, filename)):
+            return
+        if self._placeholder is None:
+            self._placeholder = _render_sector_ball(
+                0, ('#C0C0C0', '#C0C0C0'), SIZE)
+        if self.ball.images[0] is not self._placeholder:
+            self._before_placeholder = self.ball.images[0]
+        self._loading = True
+        self.ball.set_shape(self._placeholder)
+
+    def _image_loaded(self, surface, filename):
+        if surface is None:  # Go back to the ball we had
+            _logger.error('Could not load image from %s' % filename)
+            surface = self._before_placeholder
+        self._loading = False
+        self._before_placeholder = None
+        self.ball.set_shape(surface)
+
+    def _stop_loading(self):
+        ''' Cancel loading an image, so that it does not replace a ball
+        chosen after it '''
+        if self._loading:
+            from imageloader import image_loader
+            image_loader.cancel('ball')
+            self._loading = False
+            self._before_placeholder = None
 
     def new_ball_from_fraction(self, fraction):
         ''' Create a ball with a section of size fraction. '''
-        r = SIZE[0] / 2.0
-        self.ball.set_shape(svg_str_to_pixbuf(
-            svg_header(SIZE[0], SIZE[1], 1.0) +
-            svg_sector(r, r + BOX[1], r - 1, 1.999 * pi,
-                       COLORS[0], COLORS[1]) +
-            svg_sector(r, r + BOX[1], r - 1, fraction * 2 * pi,
-                       COLORS[1], COLORS[0]) +
-            svg_rect(BOX[0], BOX[1], 4, 4, 0, 0, '#FFFFFF', 'none') +
-            svg_footer()))
+        self._stop_loading()
+        key = (fraction, tuple(get_colors()[:2]), tuple(SIZE))
+        self.ball.set_shape(
+            self._sectors.get(key, lambda: _render_sector_ball(*key)))
+
+    def prepare_sectors(self, fractions):
+        ''' Render, in the background, any of the sector balls for the
+        given fractions that are not ready yet '''
+        for fraction in set(fractions):
+            key = (fraction, tuple(get_colors()[:2]), tuple(SIZE))
+            self._sectors.prefill(key, _render_sector_ball, *key)
 
     def ball_x(self):
         return self.ball.get_xy()[0]
@@ -164,10 +269,10 @@ class Ball():
         return self.ball.get_xy()[1]
 
     def frame_x(self, i):
-        return self._frames[i].get_xy()[0]
+        return self._frames.get_xy()[0]
 
     def frame_y(self, i):
-        return self._frames[i].get_xy()[1]
+        return self._frames.get_xy()[1]
 
     def width(self):
         return self.ball.rect[2]
@@ -182,14 +287,23 @@ class Ball():
         self.ball.move_relative(pos)
 
     def move_frame(self, i, pos):
-        self._frames[i].move(pos)
+        sheet = self._frame_sheet()
+        if self._frames is None:
+            self._frames = Sprite(self._sprites, 0, 0, sheet)
+            self._frames.set_layer(3)
+        elif self._frames.images[0] is not sheet:
+            self._frames.set_shape(sheet)
+        self._frames.set_source_rect(i * SIZE[0], 0, SIZE[0], SIZE[1])
+        self._frames.move(pos)
+        self._frames.set_visible(True)
+        self._current_frame = i
 
     def move_frame_relative(self, i, pos):
-        self._frames[i].move_relative(pos)
+        self._frames.move_relative(pos)
 
     def hide_frames(self):
-        for frame in self._frames:
-            frame.move((0, -SIZE[1]))  # hide the animation frames
+        if self._frames is not None:
+            self._frames.set_visible(False)
 
     def next_frame(self, frame_counter):
         if frame_counter in ANIMATION:
@@ -198,7 +312,5 @@ class Ball():
 
     def _switch_frames(self, frames):
         ''' Switch between frames in the animation '''
-        self.move_frame(frames[1], (self.frame_x(frames[0]),
-                                    self.frame_y(frames[0])))
-        self.move_frame(frames[0], ((0, -SIZE[1])))  # hide the frame
+        self._frames.set_source_rect(frames[1] * SIZE[0], 0, SIZE[0], SIZE[1])
         self._current_frame = frames[1]
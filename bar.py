@@ -10,15 +10,106 @@
 # along with this library; if not, write to the Free Software
 # Foundation, 51 Franklin Street, Suite 500 Boston, MA 02110-1335 USA
 
+from collections import OrderedDict
+from math import ceil
+
+import cairo
+
 from gi.repository import Gdk
 
 from sugar3.graphics import style
 
 from sprites import Sprite
-from svg_utils import (svg_header, svg_footer, svg_rect, svg_str_to_pixbuf,
-                       svg_wedge)
+from svg_utils import color_to_rgb
+from utils import LRUCache
 
 BAR_HEIGHT = style.GRID_CELL_SIZE
+BAR_CACHE_BUDGET = 4 * 1024 * 1024  # bytes of rendered bars to keep
+
+
+def _new_surface(w, h):
+    ''' Returns a transparent surface large enough for w x h '''
+    return cairo.ImageSurface(cairo.FORMAT_ARGB32, int(ceil(w)), int(ceil(h)))
+
+
+def _divide_wedge(cr, x, h, dy, stroke, stroke_width=3.5):
+    ''' Cuts a wedge at x into two, leaving the gap (and the strokes
+    either side of it) that two neighbouring svg_wedges would '''
+    s2 = stroke_width / 2.0
+    cr.save()
+    cr.set_operator(cairo.OPERATOR_CLEAR)
+    cr.rectangle(x, 0, s2, h)
+    cr.fill()
+    cr.restore()
+    cr.set_line_width(1)
+    cr.set_source_rgb(*color_to_rgb(stroke))
+    for edge in (x, x + s2):
+        cr.move_to(edge, h - s2)
+        cr.line_to(edge, h - dy)
+    cr.stroke()
+
+
+def _paint_wedge(cr, w, h, dx, dyl, dyr, fill, stroke, stroke_width=3.5):
+    ''' Paints the path svg_utils.svg_wedge describes, without SVG '''
+    s2 = stroke_width / 2.0
+    cr.move_to(dx + s2, h - s2)
+    cr.rel_line_to(w - s2, 0)
+    cr.rel_line_to(0, -(dyr - s2))
+    cr.rel_line_to(-(w - s2), dyr - dyl)
+    cr.close_path()
+    cr.set_source_rgb(*color_to_rgb(fill))
+    cr.fill_preserve()
+    # svg_wedge's style says stroke_width (not stroke-width), which
+    # librsvg ignores, so its wedges are stroked at the default width.
+    cr.set_line_width(1)
+    cr.set_source_rgb(*color_to_rgb(stroke))
+    cr.stroke()
+
+
+def _render_base(width, scale):
+    ''' Render the undivided wedge every bar is cut from '''
+    s = 3.5  # add provision for stroke width
+    base = _new_surface(width, BAR_HEIGHT * scale + s)
+    _paint_wedge(cairo.Context(base), width, BAR_HEIGHT * scale + s,
+                 s, s, BAR_HEIGHT * scale + s, '#000000', '#FFFFFF')
+    return base
+
+
+def _render_bar(base, nsegments, width, scale):
+    ''' Render a bar with n segments '''
+    s = 3.5
+    bar = _new_surface(width, BAR_HEIGHT * scale + s)
+    cr = cairo.Context(bar)
+    cr.set_source_surface(base, 0, 0)
+    cr.paint()
+    dx = width / float(nsegments)
+    dy = (BAR_HEIGHT * scale) / float(nsegments)
+    for i in range(1, int(nsegments)):
+        _divide_wedge(cr, i * dx + s, BAR_HEIGHT * scale + s,
+                      i * dy + s, '#FFFFFF')
+    bar.flush()
+    return bar
+
+
+def _render_mark(ball_size, width, scale):
+    ''' Render the mark that shows the fraction position on the bar '''
+    dx = ball_size / 2.
+    n = (width - ball_size) / dx
+    dy = (BAR_HEIGHT * scale) / n
+    s = 3.5
+    i = int(n / 2) - 1
+    mark = _new_surface(ball_size, BAR_HEIGHT * scale + s)
+    cr = cairo.Context(mark)
+    _paint_wedge(cr, dx, BAR_HEIGHT * scale + s,
+                 s,
+                 i * 2 * dy + s, (i * 2 + 1) * dy + s,
+                 '#FF0000', '#FFFFFF')
+    _paint_wedge(cr, dx, BAR_HEIGHT * scale + s,
+                 dx + s,
+                 (i * 2 + 1) * dy + s, (i * 2 + 2) * dy + s,
+                 '#FF0000', '#FFFFFF')
+    mark.flush()
+    return mark
 
 
 class Bar():
@@ -29,71 +120,63 @@ class Bar():
         ''' Initialize the 2-segment bar, labels, and mark '''
         self._sprites = sprites
         self._colors = colors[:]
-        self.bars = {}
+        # Every bar is the same wedge (self._base) divided into
+        # segments. The divided bars are kept, least recently used
+        # first, for as long as they fit in BAR_CACHE_BUDGET.
+        self._base = None
+        self._bars = LRUCache(budget=BAR_CACHE_BUDGET)
+        self._bar = None  # the one sprite that shows the current bar
+        self._nsegments = None
+        self.mark = None
 
         self._width = Gdk.Screen.width()
         self._height = Gdk.Screen.height() - style.GRID_CELL_SIZE
         self._scale = Gdk.Screen.height() / 900.0
+        self._y = self._height - BAR_HEIGHT * self._scale
 
         self._ball_size = ball_size
 
-        self.make_bar(2)
+        self.show_bar(2)
         self._make_wedge_mark()
 
     def resize_all(self):
+        ''' Redraw the current bar for the new screen size; the others
+        are redrawn when they are next needed. '''
         self._width = Gdk.Screen.width()
         self._height = Gdk.Screen.height() - style.GRID_CELL_SIZE
         self._scale = Gdk.Screen.height() / 900.0
+        self._y = self._height - BAR_HEIGHT * self._scale
 
-        for bar in list(self.bars.keys()):
-            self.bars[bar].hide()
-        self.mark.hide()
-
-        for bar in list(self.bars.keys()):
-            self.make_bar(bar)
+        self._base = None
+        self._bars.clear()  # (bars being rendered are dropped as well)
+        self._bar.set_shape(self.make_bar(self._nsegments))
+        self._bar.move((0, self.bar_y()))
         self._make_wedge_mark()
 
     def _make_wedge_mark(self):
         ''' Make a mark to show the fraction position on the bar. '''
-        dx = self._ball_size / 2.
-        n = (self._width - self._ball_size) / dx
-        dy = (BAR_HEIGHT * self._scale) / n
-        s = 3.5
-        i = int(n / 2) - 1
-        mark = svg_header(self._ball_size,
-                          BAR_HEIGHT * self._scale + s, 1.0)
-        mark += svg_wedge(dx, BAR_HEIGHT * self._scale + s,
-                          s,
-                          i * 2 * dy + s, (i * 2 + 1) * dy + s,
-                          '#FF0000', '#FFFFFF')
-        mark += svg_wedge(dx, BAR_HEIGHT * self._scale + s,
-                          dx + s,
-                          (i * 2 + 1) * dy + s, (i * 2 + 2) * dy + s,
-                          '#FF0000', '#FFFFFF')
-        mark += svg_footer()
-        self.mark = Sprite(self._sprites, 0,
-                           self._height,  # hide off bottom of screen
-                           svg_str_to_pixbuf(mark))
-        self.mark.set_layer(1)
+        mark = _render_mark(self._ball_size, self._width, self._scale)
+        if self.mark is None:
+            self.mark = Sprite(self._sprites, 0, self._height, mark)
+            self.mark.set_layer(1)
+        else:
+            self.mark.set_shape(mark)
+        self.mark.set_visible(False)
 
     def mark_width(self):
         return self.mark.rect[2]
 
     def bar_x(self):
-        return self.bars[2].get_xy()[0]
+        return 0
 
     def bar_y(self):
-        if self.bars[2].get_xy()[1] < 0:
-            return self.bars[2].get_xy()[1] + 3000
-        else:
-            return self.bars[2].get_xy()[1]
+        return int(self._y)
 
     def width(self):
-        return self.bars[2].rect[2]
+        return self._width
 
     def show_bar(self, n):
-        if n in self.bars:
-            self.bars[n].move([self.bar_x(), self.bar_y()])
+        self.get_bar(n).set_visible(True)
 
     def bump_bars(self, direction='up'):
         ''' when the toolbars expand and contract, we need to move the bar '''
@@ -101,56 +184,57 @@ class Bar():
             dy = -style.GRID_CELL_SIZE
         else:
             dy = style.GRID_CELL_SIZE
-        for bar in self.bars:
-            self.bars[bar].move_relative([0, dy])
+        self._y += dy
+        self._bar.move_relative([0, dy])
         self.mark.move_relative([0, dy])
 
     def hide_bars(self):
         ''' Hide all of the bars '''
-        for bar in self.bars:
-            if self.bars[bar].get_xy()[1] > 0:
-                self.bars[bar].move_relative([0, -3000])
+        self._bar.set_visible(False)
 
     def get_bar(self, nsegments):
-        ''' Return a bar with n segments '''
-        if nsegments not in self.bars:
-            self.make_bar(nsegments)
-        return self.bars[nsegments]
+        ''' Return the bar sprite, showing a bar with n segments '''
+        if self._bar is None:
+            self._bar = Sprite(self._sprites, 0, 0, self.make_bar(nsegments))
+            self._bar.set_layer(2)
+            self._bar.set_label_attributes(18, horiz_align="left", i=0)
+            self._bar.set_label_attributes(18, horiz_align="right", i=1)
+            self._bar.set_label_color('black', i=0)
+            self._bar.set_label_color('white', i=1)
+            self._bar.set_label(' 0', i=0)
+            self._bar.set_label('1 ', i=1)
+            self._bar.move((0, self.bar_y()))
+            self._bar.set_visible(False)
+        elif nsegments != self._nsegments:
+            self._bar.set_shape(self.make_bar(nsegments))
+        self._nsegments = nsegments
+        return self._bar
 
     def make_bar(self, nsegments):
-        return self._make_wedge_bar(nsegments)
+        ''' Return the image of a bar with n segments '''
+        return self._bars.get(nsegments,
+                              lambda: self._make_wedge_bar(nsegments))
+
+    def prepare_bars(self, segments):
+        ''' Render, in the background, any of the bars with the given
+        numbers of segments that are not ready yet, as many as fit in
+        BAR_CACHE_BUDGET next to the bar on the screen '''
+        if self._base is None:
+            self._base = _render_base(self._width, self._scale)
+        size = cairo.ImageSurface.format_stride_for_width(
+            cairo.FORMAT_ARGB32, self._base.get_width()) * \
+            self._base.get_height()
+        room = max(BAR_CACHE_BUDGET // size - 1, 0)
+        # Rendering more would only evict bars rendered a moment ago;
+        # any that are left out are rendered by make_bar when needed.
+        segments = [n for n in OrderedDict.fromkeys(segments)
+                    if n != self._nsegments]
+        for nsegments in segments[:room]:
+            self._bars.prefill(nsegments, _render_bar, self._base, nsegments,
+                               self._width, self._scale)
 
     def _make_wedge_bar(self, nsegments):
         ''' Create a wedged-shaped bar with n segments '''
-        s = 3.5  # add provision for stroke width
-        svg = svg_header(self._width, BAR_HEIGHT * self._scale + s, 1.0)
-        dx = self._width / float(nsegments)
-        dy = (BAR_HEIGHT * self._scale) / float(nsegments)
-        for i in range(int(nsegments) // 2):
-            svg += svg_wedge(dx, BAR_HEIGHT * self._scale + s,
-                             i * 2 * dx + s,
-                             i * 2 * dy + s, (i * 2 + 1) * dy + s,
-                             '#000000', '#FFFFFF')
-            svg += svg_wedge(dx, BAR_HEIGHT * self._scale + s,
-                             (i * 2 + 1) * dx + s,
-                             (i * 2 + 1) * dy + s, (i * 2 + 2) * dy + s,
-                             '#000000', '#FFFFFF')
-        if int(nsegments) % 2 == 1:  # odd
-            svg += svg_wedge(dx, BAR_HEIGHT * self._scale + s,
-                             (i * 2 + 2) * dx + s,
-                             (i * 2 + 2) * dy + s,
-                             BAR_HEIGHT * self._scale + s,
-                             '#000000', '#FFFFFF')
-        svg += svg_footer()
-
-        self.bars[nsegments] = Sprite(self._sprites, 0, 0,
-                                      svg_str_to_pixbuf(svg))
-        self.bars[nsegments].set_layer(2)
-        self.bars[nsegments].set_label_attributes(18, horiz_align="left", i=0)
-        self.bars[nsegments].set_label_attributes(18, horiz_align="right", i=1)
-        self.bars[nsegments].set_label_color('black', i=0)
-        self.bars[nsegments].set_label_color('white', i=1)
-        self.bars[nsegments].set_label(' 0', i=0)
-        self.bars[nsegments].set_label('1 ', i=1)
-        self.bars[nsegments].move(
-            (0, self._height - BAR_HEIGHT * self._scale))
+        if self._base is None:
+            self._base = _render_base(self._width, self._scale)
+        return _render_bar(self._base, nsegments, self._width, self._scale)
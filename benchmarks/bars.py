@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright (c) 2026, FractionBounce contributors
+
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# You should have received a copy of the GNU General Public License
+# along with this library; if not, write to the Free Software
+# Foundation, 51 Franklin Street, Suite 500 Boston, MA 02110-1335 USA
+
+'''
+Time rendering a bar of every size from 2 to 100 segments, as SVG
+wedges rasterized by librsvg (as Bar did before) and divided from one
+wedge painted with Cairo (as it does now).
+
+    python3 benchmarks/bars.py [WIDTH]
+'''
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bar import BAR_HEIGHT, _render_base, _render_bar
+from svg_utils import svg_wedge_bar, rasterize_svg, pixbuf_to_surface
+
+SCALE = 1.0
+
+
+def render_svg_bar(nsegments, width, scale):
+    ''' Render a bar the way Bar._make_wedge_bar did before '''
+    return pixbuf_to_surface(rasterize_svg(
+        svg_wedge_bar(nsegments, width, BAR_HEIGHT * scale).encode()))
+
+
+def main(width):
+    start = time.perf_counter()
+    base = _render_base(width, SCALE)
+    base_time = time.perf_counter() - start
+    print('base wedge %8.2f ms' % (1e3 * base_time))
+    print('segments      svg (ms)    cairo (ms)')
+    totals = [0, 0]
+    for nsegments in range(2, 101):
+        times = []
+        for render in (lambda: render_svg_bar(nsegments, width, SCALE),
+                       lambda: _render_bar(base, nsegments, width, SCALE)):
+            start = time.perf_counter()
+            render().flush()
+            times.append(time.perf_counter() - start)
+        totals[0] += times[0]
+        totals[1] += times[1]
+        print('%8d %12.2f %13.2f' % (nsegments, 1e3 * times[0],
+                                     1e3 * times[1]))
+    print('   total %12.2f %13.2f' % (1e3 * totals[0],
+                                      1e3 * (totals[1] + base_time)))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1200)
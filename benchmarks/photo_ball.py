@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright (c) 2026, FractionBounce contributors
+
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# You should have received a copy of the GNU General Public License
+# along with this library; if not, write to the Free Software
+# Foundation, 51 Franklin Street, Suite 500 Boston, MA 02110-1335 USA
+
+'''
+Measure the time and peak memory of making a ball from a photo, the
+way new_ball_from_image did before (decode the whole image, crop and
+scale it, save it as a PNG and rasterize an SVG that links to it) and
+the way it does now (decode at the size of the ball and paint it).
+
+Each way runs in a fresh process, so that its peak resident size is
+its own.  Without an image, a 12 megapixel JPEG (4000x3000) is made.
+
+    python3 benchmarks/photo_ball.py [IMAGE]
+'''
+
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from gi.repository import Gio, GdkPixbuf
+
+# Both ways import the same modules, so that neither is charged for
+# importing them.
+from ball import _render_image_ball
+from svg_utils import pixbuf_to_surface
+
+BALL_SVG = '''<?xml version="1.0" encoding="UTF-8" standalone="no"?>
+<svg xmlns="http://www.w3.org/2000/svg"
+     xmlns:xlink="http://www.w3.org/1999/xlink"
+     version="1.1" width="85" height="120">
+<image xlink:href="file://%s" x="0" y="35" width="85" height="85" />
+<rect width="85" height="35" ry="7.75" x="0" y="0"
+      style="fill:#ffffff;fill-opacity:1;stroke:none" />
+</svg>'''
+
+
+def make_ball_before(filename, tmp):
+    ''' Ball.new_ball_from_image and generate_ball_svg, as they were '''
+    pixbuf = GdkPixbuf.Pixbuf.new_from_file(filename)
+    if pixbuf.get_width() > pixbuf.get_height():
+        size = pixbuf.get_height()
+        x = int((pixbuf.get_width() - size) // 2)
+    else:
+        size = pixbuf.get_width()
+        x = int((pixbuf.get_height() - size) // 2)
+    crop = GdkPixbuf.Pixbuf.new(0, True, 8, size, size)
+    pixbuf.copy_area(x, 0, size, size, crop, 0, 0)
+    scale = crop.scale_simple(85, 85, GdkPixbuf.InterpType.BILINEAR)
+    save_path = os.path.join(tmp, 'custom.png')
+    scale.savev(save_path, 'png', [], [])
+    loader = GdkPixbuf.PixbufLoader.new_with_type('svg')
+    loader.write((BALL_SVG % save_path).encode())
+    loader.close()
+    return pixbuf_to_surface(loader.get_pixbuf())
+
+
+def make_ball_after(filename, tmp):
+    ''' Ball.new_ball_from_image, minus the worker thread '''
+    return _render_image_ball(Gio.File.new_for_path(filename).read(None))
+
+
+def run(how, filename):
+    ''' Make one ball and print the seconds taken and the peak RSS '''
+    make_ball = {'before': make_ball_before, 'after': make_ball_after}[how]
+    tmp = tempfile.mkdtemp()
+    start = time.perf_counter()
+    make_ball(filename, tmp).flush()
+    elapsed = time.perf_counter() - start
+    print(elapsed, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+
+
+def make_photo(filename, width=4000, height=3000):
+    ''' Save a JPEG with some detail in it, so it is not trivial to
+    decode '''
+    row = GdkPixbuf.Pixbuf.new(GdkPixbuf.Colorspace.RGB, False, 8, width, 1)
+    photo = GdkPixbuf.Pixbuf.new(GdkPixbuf.Colorspace.RGB, False, 8,
+                                 width, height)
+    for y in range(height):
+        row.fill(((y * 7919) % 0xFFFFFF) << 8 | 0xFF)
+        row.copy_area(0, 0, width, 1, photo, 0, y)
+    photo.savev(filename, 'jpeg', ['quality'], ['90'])
+
+
+def main(filename=None):
+    if filename is None:
+        filename = os.path.join(tempfile.mkdtemp(), 'photo.jpg')
+        make_photo(filename)
+    print('%s: %dx%d' % ((filename,) +
+                         GdkPixbuf.Pixbuf.get_file_info(filename)[1:]))
+    for how in ('before', 'after'):
+        out = subprocess.check_output(
+            [sys.executable, os.path.abspath(__file__), '--run', how,
+             filename], cwd=ROOT)
+        elapsed, maxrss = out.split()
+        print('%-7s %8.1f ms %8.1f MiB peak RSS' %
+              (how, 1e3 * float(elapsed), int(maxrss) / 1024.))
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == '--run':
+        run(sys.argv[2], sys.argv[3])
+    else:
+        main(sys.argv[1] if len(sys.argv) > 1 else None)
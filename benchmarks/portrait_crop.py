@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright (c) 2026, FractionBounce contributors
+
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# You should have received a copy of the GNU General Public License
+# along with this library; if not, write to the Free Software
+# Foundation, 51 Franklin Street, Suite 500 Boston, MA 02110-1335 USA
+
+'''
+Measure the time and peak memory of cropping a background for a
+portrait screen after the screen turns from 1200x900 to 900x1200, the
+way _crop_to_portrait did before (a new pixbuf and copy_area) and the
+way it does now (a new_subpixbuf view), each followed by
+pixbuf_to_surface.
+
+Each way runs in a fresh process, so that its peak resident size is
+its own.  Importing bounce needs the sugar3 library (but no Sugar
+session).
+
+    python3 benchmarks/portrait_crop.py [IMAGE]
+'''
+
+import os
+import resource
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from gi.repository import GdkPixbuf
+
+from bounce import _crop_to_portrait
+from svg_utils import pixbuf_to_surface
+
+SCREEN = (900, 1200)  # 1200x900, rotated
+
+
+def crop_before(pixbuf, screen_width, screen_height):
+    ''' Bounce._crop_to_portrait, as it was '''
+    tmp = GdkPixbuf.Pixbuf.new(0, True, 8, screen_width, screen_height)
+    x = int(screen_height // 3)
+    pixbuf.copy_area(x, 0, screen_width, screen_height, tmp, 0, 0)
+    return tmp
+
+
+def run(how, filename):
+    ''' Crop one background and print the seconds taken, and the peak
+    RSS before and after '''
+    crop = {'before': crop_before, 'after': _crop_to_portrait}[how]
+    # The background scaled to the portrait screen, as
+    # _render_background does before it crops
+    height = SCREEN[1]
+    width = int(4 * height // 3)
+    pixbuf = GdkPixbuf.Pixbuf.new_from_file(filename).scale_simple(
+        width, height, GdkPixbuf.InterpType.BILINEAR)
+    setup = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    pixbuf_to_surface(crop(pixbuf, *SCREEN)).flush()
+    elapsed = time.perf_counter() - start
+    print(elapsed, setup, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+
+
+def main(filename):
+    print('%s cropped to %dx%d' % ((filename,) + SCREEN))
+    for how in ('before', 'after'):
+        out = subprocess.check_output(
+            [sys.executable, os.path.abspath(__file__), '--run', how,
+             filename], cwd=ROOT)
+        elapsed, setup, maxrss = out.split()
+        print('%-7s %8.1f ms %8.1f MiB peak RSS (+%.1f MiB)' %
+              (how, 1e3 * float(elapsed), int(maxrss) / 1024.,
+               (int(maxrss) - int(setup)) / 1024.))
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == '--run':
+        run(sys.argv[2], sys.argv[3])
+    else:
+        main(sys.argv[1] if len(sys.argv) > 1 else
+             os.path.join(ROOT, 'images', 'grass_background.png'))
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright (c) 2026, FractionBounce contributors
+
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# You should have received a copy of the GNU General Public License
+# along with this library; if not, write to the Free Software
+# Foundation, 51 Franklin Street, Suite 500 Boston, MA 02110-1335 USA
+
+'''
+Time drawing a labelled sprite (the ball) N times, with the flattened
+composite cache and without it (painting the image and laying out the
+label on every draw, as Sprite.draw did before the cache).
+
+    python3 benchmarks/sprite_frames.py [N]
+'''
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cairo
+
+from sprites import Sprites, Sprite
+
+
+class Canvas():
+    ''' Just enough of a widget for Sprites to draw off screen '''
+
+    def get_allocated_width(self):
+        return 1200
+
+    def get_allocated_height(self):
+        return 900
+
+    def queue_draw_region(self, region):
+        pass
+
+
+def draw_uncached(spr, cr):
+    ''' Draw a sprite the way Sprite.draw did before the cache '''
+    x, y, w, h = spr.rect
+    for image, dx, dy in spr._sources:
+        cr.set_source_surface(image, x + dx, y + dy)
+        cr.rectangle(x + dx, y + dy, w, h)
+        cr.fill()
+    spr.draw_label(cr)
+
+
+def main(n):
+    target = cairo.ImageSurface(cairo.FORMAT_ARGB32, 1200, 900)
+    cr = cairo.Context(target)
+    image = cairo.ImageSurface(cairo.FORMAT_ARGB32, 85, 120)
+    spr = Sprite(Sprites(Canvas()), 100, 100, image)
+    spr.set_label_attributes(24, vert_align='top')
+    spr.set_label('13/16')
+
+    for name, draw in (('uncached', draw_uncached),
+                       ('cached', lambda spr, cr: spr.draw(cr=cr))):
+        draw(spr, cr)  # Warm up (and fill the cache)
+        target.flush()
+        start = time.perf_counter()
+        for i in range(n):
+            draw(spr, cr)
+        target.flush()
+        elapsed = time.perf_counter() - start
+        print('%-8s %8.1f us/frame' % (name, 1e6 * elapsed / n))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10000)
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright (c) 2026, FractionBounce contributors
+
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# You should have received a copy of the GNU General Public License
+# along with this library; if not, write to the Free Software
+# Foundation, 51 Franklin Street, Suite 500 Boston, MA 02110-1335 USA
+
+'''
+Measure the memory used by N sprites, and the memory still held after
+N sprites have been created and discarded ten times over (as happens
+to the bars and balls during a long game).
+
+Pass a git revision to compare with the sprites.py of that revision,
+e.g., the one before the rects were packed into an array:
+
+    python3 benchmarks/sprite_memory.py [N] [REVISION]
+'''
+
+import gc
+import os
+import subprocess
+import sys
+import tempfile
+import tracemalloc
+from importlib import util
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import cairo
+
+ROUNDS = 10
+
+
+class Canvas():
+    ''' Just enough of a widget for Sprites to draw off screen '''
+
+    def get_allocated_width(self):
+        return 1200
+
+    def get_allocated_height(self):
+        return 900
+
+    def queue_draw_region(self, region):
+        pass
+
+    def queue_draw_area(self, x, y, w, h):
+        pass
+
+
+def load_sprites(revision):
+    ''' Import sprites.py as it was at revision '''
+    source = subprocess.check_output(['git', 'show', revision + ':sprites.py'],
+                                     cwd=ROOT)
+    with tempfile.NamedTemporaryFile(suffix='.py', delete=False) as fd:
+        fd.write(source)
+    spec = util.spec_from_file_location('sprites_' + revision, fd.name)
+    module = util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    os.remove(fd.name)
+    return module
+
+
+def measure(module, n):
+    image = cairo.ImageSurface(cairo.FORMAT_ARGB32, 85, 120)
+    gc.collect()
+    tracemalloc.start()
+    sprites = module.Sprites(Canvas())
+    kept = [module.Sprite(sprites, i % 1000, i // 1000, image)
+            for i in range(n)]
+    held = tracemalloc.get_traced_memory()[0]
+    for spr in kept:
+        spr.hide()
+    del kept
+    for r in range(ROUNDS):
+        for i in range(n):
+            module.Sprite(sprites, i % 1000, i // 1000, image).hide()
+    gc.collect()
+    retained = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return held, retained
+
+
+def main(n, revision=None):
+    import sprites
+    modules = [('current', sprites)]
+    if revision is not None:
+        modules.insert(0, (revision, load_sprites(revision)))
+    for name, module in modules:
+        held, retained = measure(module, n)
+        print('%-8s %8.1f KiB for %d sprites, %8.1f KiB held after %d '
+              'rounds' % (name, held / 1024, n, retained / 1024, ROUNDS))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10000,
+         sys.argv[2] if len(sys.argv) > 2 else None)
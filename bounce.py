@@ -50,27 +50,29 @@ ACCELEROMETER_DEVICE = '/sys/devices/platform/lis3lv02d/position'
 CRASH = 'crash.ogg'  # wrong answer sound
 LAUGH = 'bottle.ogg'  # correct answer sound
 BUBBLES = 'bubbles.ogg'  # Easter Egg sound
+BACKGROUND_CACHE_SIZE = 4  # number of scaled backgrounds to keep
 
 import os
-import subprocess
+import time
 from random import uniform
 
 from gi.repository import GLib, Gtk, Gdk, GdkPixbuf
 
-from svg_utils import (svg_header, svg_footer, svg_rect, svg_str_to_pixbuf,
-                       svg_from_file)
+from svg_utils import svg_str_to_surface, pixbuf_to_surface
+from surfacecache import surface_cache, file_key
+from assets import assets
+from utils import LRUCache, run_async, get_colors
 from aplay import aplay
 
 from ball import Ball
 from bar import Bar, BAR_HEIGHT
+from scoreboard import Scoreboard
 
 from gettext import gettext as _
 
 import logging
 _logger = logging.getLogger('fractionbounce-activity')
 
-from sugar3 import profile
-COLORS = profile.get_color().to_string().split(',')
 from sugar3.graphics import style
 GRID_CELL_SIZE = style.GRID_CELL_SIZE
 
@@ -80,6 +82,7 @@ from sprites import Sprites, Sprite
 def _is_tablet_mode():
     if not os.path.exists('/dev/input/event4'):
         return False
+    import subprocess
     try:
         output = subprocess.call(
             ['evtest', '--query', '/dev/input/event4', 'EV_SW',
@@ -91,12 +94,53 @@ def _is_tablet_mode():
     return False
 
 
+def _decode(data):
+    ''' Decode an image from the contents of its file '''
+    pl = GdkPixbuf.PixbufLoader()
+    pl.write(bytes(data))
+    pl.close()
+    return pl.get_pixbuf()
+
+
+def _render_background(pixbuf, width, height, screen_width, screen_height):
+    ''' Scale a background to fit width x height (and, on a portrait
+    screen, crop it to the screen) '''
+    scale = min(width / float(pixbuf.get_width()),
+                height / float(pixbuf.get_height()))
+    pixbuf = pixbuf.scale_simple(
+        max(1, int(pixbuf.get_width() * scale)),
+        max(1, int(pixbuf.get_height() * scale)),
+        GdkPixbuf.InterpType.BILINEAR)
+    if screen_height > screen_width:
+        pixbuf = _crop_to_portrait(pixbuf, screen_width, screen_height)
+    return pixbuf_to_surface(pixbuf)
+
+
+def _crop_to_portrait(pixbuf, screen_width, screen_height):
+    ''' Return a view of the part of pixbuf that fits on a portrait
+    screen (which shares the pixels of pixbuf rather than copying
+    them) '''
+    x = min(int(screen_height // 3), pixbuf.get_width() - 1)
+    return pixbuf.new_subpixbuf(
+        x, 0, min(screen_width, pixbuf.get_width() - x),
+        min(screen_height, pixbuf.get_height()))
+
+
+def _load_rewards(smiley, frown):
+    ''' Render the reward graphics from their SVG '''
+    return svg_str_to_surface(smiley), svg_str_to_surface(frown)
+
+
 class Bounce():
     ''' The Bounce class is used to define the ball and the user
     interaction. '''
 
     def __init__(self, canvas, path, parent=None):
         ''' Initialize the canvas and set up the callbacks. '''
+        self._started = time.time()
+        self.time_to_first_frame = None  # seconds, once it is drawn
+        self._preload_backgrounds = []  # loaded after the first frame
+        self._preload_balls = []
         self._activity = parent
         self._fraction = None
         self._path = path
@@ -130,6 +174,8 @@ class Bounce():
 
         self._step_sid = None  # repeating timeout between steps of ball move
         self._bounce_sid = None  # one-off timeout between bounces
+        self._paused = None  # what pause interrupted: 'step' or 'bounce'
+        self._loading_background = False  # a Journal image is loading
         self.buddies = []  # used for sharing
         self._my_turn = False
         self.select_a_fraction = False
@@ -188,31 +234,14 @@ class Bounce():
         self._height = Gdk.Screen.height() - GRID_CELL_SIZE
         self._scale = Gdk.Screen.height() / 900.0
 
-        # We need to resize the backgrounds
-        width, height = self._calc_background_size()
-        for bg in list(self._backgrounds.keys()):
-            if bg == 'custom':
-                path = self._custom_dsobject.file_path
-                pixbuf = GdkPixbuf.Pixbuf.new_from_file_at_size(
-                    path, width, height)
-            else:
-                pixbuf = GdkPixbuf.Pixbuf.new_from_file_at_size(
-                    os.path.join(self._path, 'images', bg),
-                    width, height)
-            if Gdk.Screen.height() > Gdk.Screen.width():
-                pixbuf = self._crop_to_portrait(pixbuf)
-
-            self._backgrounds[bg] = pixbuf
+        # We need to resize the background (the others are resized
+        # when they are next shown, and any being rendered for the old
+        # size are dropped)
+        self._backgrounds.drop_pending()
+        self._background.set_shape(self._get_background(self._current_bg))
 
-        self._background = Sprite(self._sprites, 0, 0,
-                                  self._backgrounds[self._current_bg])
-        self._background.set_layer(-100)
-        self._background.type = 'background'
-
-        # and resize and reposition the bars
+        # and resize and reposition the bars (the current bar stays up)
         self.bar.resize_all()
-        self.bar.show_bar(2)
-        self._current_bar = self.bar.get_bar(2)
 
         # Calculate a new accerlation based on screen height.
         self._ddy = (6.67 * self._height) / (STEPS * STEPS)
@@ -221,23 +250,14 @@ class Bounce():
 
     def _create_sprites(self, path):
         ''' Create all of the sprites we'll need '''
-        self.smiley_graphic = svg_str_to_pixbuf(svg_from_file(
-            os.path.join(path, 'images', 'smiley.svg')))
-
-        self.frown_graphic = svg_str_to_pixbuf(svg_from_file(
-            os.path.join(path, 'images', 'frown.svg')))
-
-        self.blank_graphic = svg_str_to_pixbuf(
-            svg_header(REWARD_HEIGHT, REWARD_HEIGHT, 1.0) +
-            svg_rect(REWARD_HEIGHT, REWARD_HEIGHT, 5, 5, 0, 0,
-                     'none', 'none') +
-            svg_footer())
+        # The reward graphics are loaded after the first frame is drawn.
+        self._scoreboard = Scoreboard(self._sprites, REWARD_HEIGHT)
 
         self.ball = Ball(self._sprites,
                          os.path.join(path, 'images', 'soccerball.svg'))
         self._current_frame = 0
 
-        self.bar = Bar(self._sprites, self.ball.width(), COLORS)
+        self.bar = Bar(self._sprites, self.ball.width(), get_colors())
         self._current_bar = self.bar.get_bar(2)
 
         self.ball_y_max = \
@@ -245,28 +265,89 @@ class Bounce():
         self.ball.move_ball((int((self._width - self.ball.width()) // 2),
                              self.ball_y_max))
 
-        self._backgrounds = {}
-        width, height = self._calc_background_size()
-        pixbuf = GdkPixbuf.Pixbuf.new_from_file_at_size(
-            os.path.join(path, 'images', 'grass_background.png'),
-            width, height)
-        if Gdk.Screen.height() > Gdk.Screen.width():
-            pixbuf = self._crop_to_portrait(pixbuf)
-
-        self._backgrounds['grass_background.png'] = pixbuf
-
-        self._background = Sprite(self._sprites, 0, 0, pixbuf)
+        # Backgrounds are decoded once (the master) and then scaled to
+        # each size they are shown at.
+        self._masters = {}
+        self._backgrounds = LRUCache(size=BACKGROUND_CACHE_SIZE)
+        self._background = Sprite(
+            self._sprites, 0, 0, self._get_background('grass_background.png'))
         self._background.set_layer(-100)
         self._background.type = 'background'
         self._current_bg = 'grass_background.png'
 
-    def _crop_to_portrait(self, pixbuf):
-        tmp = GdkPixbuf.Pixbuf.new(0, True, 8, Gdk.Screen.width(),
-                                   Gdk.Screen.height())
-        x = int(Gdk.Screen.height() // 3)
-        pixbuf.copy_area(x, 0, Gdk.Screen.width(), Gdk.Screen.height(),
-                         tmp, 0, 0)
-        return tmp
+    def _get_background(self, name):
+        ''' Return a background, scaled (and cropped) to fit the screen '''
+        width, height = self._calc_background_size()
+        key = (name, width, height)
+        if key in self._backgrounds:
+            return self._backgrounds.get(key)
+
+        screen = (Gdk.Screen.width(), Gdk.Screen.height())
+        if name == 'custom':
+            surface = _render_background(self._masters['custom'],
+                                         width, height, *screen)
+        else:
+            # The portrait crop depends on the screen size as well.
+            surface = surface_cache.get(
+                file_key(os.path.join(self._path, 'images', name)),
+                lambda: _render_background(self._get_master(name),
+                                           width, height, *screen),
+                size=(width, height) + screen)
+        return self._backgrounds.put(key, surface)
+
+    def _get_master(self, name):
+        ''' Return a background image, decoded at full size '''
+        if name not in self._masters:
+            self._masters[name] = _decode(assets.read(
+                os.path.join(self._path, 'images', name)))
+        return self._masters[name]
+
+    def prepare_backgrounds(self, names):
+        ''' Render, in the background, any of the named backgrounds that
+        are not ready yet '''
+        width, height = self._calc_background_size()
+        screen = (Gdk.Screen.width(), Gdk.Screen.height())
+        for name in names:
+            key = (name, width, height)
+            if key in self._backgrounds:
+                continue
+            path = os.path.join(self._path, 'images', name)
+
+            def render(data=assets.read(path)):
+                return _render_background(_decode(data), width, height,
+                                          *screen)
+
+            self._backgrounds.prefill(key, surface_cache.get, file_key(path),
+                                      render, (width, height) + screen)
+
+    def preload(self, backgrounds, balls):
+        ''' Load these backgrounds and balls (SVG files) in the
+        background once the first frame has been drawn '''
+        if self.time_to_first_frame is None:
+            self._preload_backgrounds = backgrounds
+            self._preload_balls = balls
+        else:
+            self.prepare_backgrounds(backgrounds)
+            self.ball.prepare_balls(balls)
+
+    def _preload(self):
+        ''' Load everything not needed for the first frame '''
+        run_async(_load_rewards,
+                  (assets.read(os.path.join(self._path, 'images',
+                                            'smiley.svg')),
+                   assets.read(os.path.join(self._path, 'images',
+                                            'frown.svg'))),
+                  self._rewards_loaded)
+        self.prepare_backgrounds(self._preload_backgrounds)
+        self.ball.prepare_balls(self._preload_balls)
+        # GStreamer is slow to start, so start it now rather than when
+        # the first sound plays.
+        GLib.idle_add(aplay.warm_up)
+        return False
+
+    def _rewards_loaded(self, rewards):
+        if rewards is not None:
+            self._scoreboard.set_rewards(*rewards)
 
     def _calc_background_size(self):
         if Gdk.Screen.height() > Gdk.Screen.width():
@@ -279,27 +360,37 @@ class Bounce():
     def new_background_from_image(self, path, dsobject=None):
         if path is None:
             path = dsobject.file_path
-        width, height = self._calc_background_size()
-        pixbuf = GdkPixbuf.Pixbuf.new_from_file_at_size(
-            path, width, height)
-
-        if Gdk.Screen.height() > Gdk.Screen.width():
-            pixbuf = self._crop_to_portrait(pixbuf)
-
-        self._backgrounds['custom'] = pixbuf
+        # Keep the image no larger than any size it will be shown at.
+        size = int(4 * max(Gdk.Screen.width(), Gdk.Screen.height()) // 3)
+
+        def fit(width, height):
+            scale = min(1.0, size / float(width), size / float(height))
+            return max(1, int(width * scale)), max(1, int(height * scale))
+
+        # The current background stays up until the new one is ready.
+        from imageloader import image_loader, decode
+        self._loading_background = image_loader.load(
+            'background', path,
+            lambda stream, cancellable: decode(stream, fit, cancellable),
+            self._background_loaded)
+
+    def _background_loaded(self, pixbuf):
+        self._loading_background = False
+        if pixbuf is None:
+            return
+        self._masters['custom'] = pixbuf
+        for key in self._backgrounds.keys():
+            if key[0] == 'custom':
+                self._backgrounds.discard(key)
         self.set_background('custom')
-        self._custom_dsobject = dsobject
-        self._current_bg = 'custom'
 
     def set_background(self, name):
-        if name not in self._backgrounds:
-            width, height = self._calc_background_size()
-            pixbuf = GdkPixbuf.Pixbuf.new_from_file_at_size(
-                os.path.join(self._path, 'images', name), width, height)
-            if Gdk.Screen.height() > Gdk.Screen.width():
-                pixbuf = self._crop_to_portrait(pixbuf)
-            self._backgrounds[name] = pixbuf
-        self._background.set_image(self._backgrounds[name])
+        if self._loading_background:
+            # A background chosen while an image loads replaces it.
+            from imageloader import image_loader
+            image_loader.cancel('background')
+            self._loading_background = False
+        self._background.set_image(self._get_background(name))
         self.bar.mark.hide()
         self._current_bar.hide()
         self.ball.ball.hide()
@@ -314,10 +405,20 @@ class Bounce():
         if self._step_sid is not None:
             GLib.source_remove(self._step_sid)
             self._step_sid = None
+            self._paused = 'step'
 
         if self._bounce_sid is not None:
             GLib.source_remove(self._bounce_sid)
             self._bounce_sid = None
+            self._paused = 'bounce'
+
+    def resume(self):
+        ''' Carry on with the play that pause stopped '''
+        if self._paused == 'step':
+            self._step_sid = GLib.timeout_add(STEP_PAUSE, self._step)
+        elif self._paused == 'bounce':
+            self._defer_bounce(BOUNCE_PAUSE)
+        self._paused = None
 
     def we_are_sharing(self):
         ''' If there is more than one buddy, we are sharing. '''
@@ -421,6 +522,18 @@ class Bounce():
     def _defer_bounce(self, ms):
         ''' Pause and then start the ball again '''
         self._bounce_sid = GLib.timeout_add(ms, self._bounce)
+        # Use the pause to render any bars the next bounce may need.
+        self._prepare_bars()
+
+    def _prepare_bars(self):
+        ''' Render the bars for the current challenges in the background '''
+        if self._expert:
+            self.bar.prepare_bars([2])
+        elif self.mode == 'percents':
+            self.bar.prepare_bars([10])
+        else:
+            self.bar.prepare_bars(
+                [challenge[1] for challenge in self._challenges])
 
     def _bounce(self):
         ''' Start the ball again '''
@@ -437,7 +550,7 @@ class Bounce():
     def _step(self):
         ''' Move the ball once and test boundary conditions '''
         if self._new_bounce:
-            self.bar.mark.move((0, self._height))  # hide the mark
+            self.bar.mark.set_visible(False)
             if not self.we_are_sharing():
                 self._choose_a_fraction()
             self._new_bounce = False
@@ -508,7 +621,7 @@ class Bounce():
             self._frame_counter = 0
             self.ball.move_frame(self._current_frame,
                                  (self.ball.ball_x(), self.ball.ball_y()))
-            self.ball.move_ball((self.ball.ball_x(), self._height))
+            self.ball.ball.set_visible(False)
             aplay.play(self._path_to_bubbles)
 
         if self._accelerometer:
@@ -529,6 +642,7 @@ class Bounce():
         if self.ball.frame_y(self._current_frame) >= self.ball_y_max:
             # hit the bottom
             self.ball.move_ball((self.ball.ball_x(), self.ball_y_max))
+            self.ball.ball.set_visible(True)
             self.ball.hide_frames()
             self._test(easter_egg=True)
             self._new_bounce = True
@@ -547,7 +661,11 @@ class Bounce():
             n = int(uniform(0, len(self._challenges)))
         else:
             n = self._n
-        fstr = self._challenges[n][0]
+        fraction, fstr = self._parse_challenge(self._challenges[n][0])
+        return fraction, fstr, n
+
+    def _parse_challenge(self, fstr):
+        ''' Return the value of a challenge (and its label) '''
         if '/' in fstr:  # fraction
             numden = fstr.split('/', 2)
             fraction = float(numden[0].strip()) / float(numden[1].strip())
@@ -557,7 +675,15 @@ class Bounce():
             _logger.debug('Could not parse challenge (%s)', fstr)
             fstr = '1/2'
             fraction = 0.5
-        return fraction, fstr, n
+        return fraction, fstr
+
+    def prepare_sectors(self):
+        ''' Render the sector balls for the current challenges in the
+        background '''
+        if self.mode == 'sectors':
+            self.ball.prepare_sectors(
+                [self._parse_challenge(challenge[0])[0]
+                 for challenge in self._challenges])
 
     def _choose_a_fraction(self):
         ''' choose a new fraction and set the corresponding bar '''
@@ -620,23 +746,16 @@ class Bounce():
         f = int(self._fraction * self.bar.width())
         self.bar.mark.move((int(f - self.bar.mark_width() / 2),
                             int(self.bar.bar_y() + self._mark_offset(f))))
-        if self._challenges[self._n][2] == 0:  # label the column
-            spr = Sprite(self._sprites, 0, 0, self.blank_graphic)
-            spr.set_label(self._label)
-            spr.move((int(self._n * 27), 0))
-            spr.set_layer(-1)
+        self.bar.mark.set_visible(True)
         self._challenges[self._n][2] += 1
         if x > f - delta and x < f + delta:
-            spr = Sprite(self._sprites, 0, 0, self.smiley_graphic)
+            self._scoreboard.add_result(self._n, self._label, True)
             self._correct += 1
             aplay.play(self._path_to_success)
         else:
-            spr = Sprite(self._sprites, 0, 0, self.frown_graphic)
+            self._scoreboard.add_result(self._n, self._label, False)
             aplay.play(self._path_to_failure)
 
-        spr.move((int(self._n * 27), int(self._challenges[self._n][2] * 27)))
-        spr.set_layer(-1)
-
         # after enough correct answers, up the difficulty
         if self._correct == len(self._challenges) * 2:
             self._challenge += 1
@@ -645,6 +764,8 @@ class Bounce():
                     self._challenges.append(challenge)
             else:
                 self._expert = True
+            self._prepare_bars()
+            self.prepare_sectors()
 
         self.count += 1
         self._dx = 0.  # stop horizontal movement between bounces
@@ -681,6 +802,11 @@ class Bounce():
 
     def __draw_cb(self, canvas, cr):
         self._sprites.redraw_sprites(cr=cr)
+        if self.time_to_first_frame is None:
+            self.time_to_first_frame = time.time() - self._started
+            _logger.debug('Time to first frame: %.3f seconds',
+                          self.time_to_first_frame)
+            GLib.idle_add(self._preload)
 
     def _destroy_cb(self, win, event):
         ''' Callback to handle quit '''
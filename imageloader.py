@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2026, FractionBounce contributors
+
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# You should have received a copy of the GNU General Public License
+# along with this library; if not, write to the Free Software
+# Foundation, 51 Franklin Street, Suite 500 Boston, MA 02110-1335 USA
+
+'''
+imageloader.py decodes user images (from the Journal) in a worker
+thread, so that the ball keeps bouncing while a large photo loads.
+
+Each request has a key (e.g., 'ball' or 'background'); a new request
+for a key cancels the one before it, and the result of a cancelled
+request is never delivered.
+'''
+
+from gi.repository import Gio, GLib, GdkPixbuf
+
+from utils import run_async
+
+import logging
+_logger = logging.getLogger('fractionbounce-activity')
+
+CHUNK = 64 * 1024  # bytes read from the image file at a time
+
+
+def decode(stream, size_func, cancellable=None):
+    ''' Decode the image in stream at the size size_func(width, height)
+    returns, giving up if cancellable is cancelled '''
+    loader = GdkPixbuf.PixbufLoader()
+    loader.connect('size-prepared',
+                   lambda pl, w, h: pl.set_size(*size_func(w, h)))
+    try:
+        while True:
+            data = stream.read_bytes(CHUNK, cancellable)
+            if data.get_size() == 0:
+                break
+            loader.write_bytes(data)
+    except GLib.Error:
+        try:
+            loader.close()
+        except GLib.Error:
+            pass
+        raise
+    finally:
+        stream.close(None)
+    loader.close()
+    return loader.get_pixbuf()
+
+
+class ImageLoader():
+    ''' Runs image decoding in the background, one request per key '''
+
+    def __init__(self):
+        self._requests = {}  # key -> Gio.Cancellable
+
+    def load(self, key, path, func, callback):
+        ''' Open path and call func(stream, cancellable) in a worker
+        thread; pass the result (None if it failed) to callback on the
+        main loop. Returns False if path could not be opened. '''
+        self.cancel(key)
+        # The file is opened here, so it can still be read after the
+        # caller is done with it (e.g., when a Journal object that
+        # owns the file is destroyed).
+        try:
+            stream = Gio.File.new_for_path(path).read(None)
+        except GLib.Error as e:
+            _logger.error('Could not open %s: %s' % (path, e))
+            return False
+        cancellable = Gio.Cancellable()
+        self._requests[key] = cancellable
+        run_async(_run, (func, stream, cancellable), self._loaded, key,
+                  cancellable, callback)
+        return True
+
+    def cancel(self, key):
+        ''' Cancel the request for key, if there is one '''
+        if key in self._requests:
+            self._requests.pop(key).cancel()
+
+    def _loaded(self, result, key, cancellable, callback):
+        if cancellable.is_cancelled():
+            return
+        del self._requests[key]
+        callback(result)
+
+
+def _run(func, stream, cancellable):
+    try:
+        return func(stream, cancellable)
+    except GLib.Error:
+        if cancellable.is_cancelled():
+            return None
+        raise
+
+
+image_loader = ImageLoader()
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2026, FractionBounce contributors
+
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# You should have received a copy of the GNU General Public License
+# along with this library; if not, write to the Free Software
+# Foundation, 51 Franklin Street, Suite 500 Boston, MA 02110-1335 USA
+
+import cairo
+
+from gi.repository import Gdk, Pango, PangoCairo
+
+from sprites import Sprite
+
+CELL = 27  # distance between the rewards on the scoreboard
+GROW = 4  # number of cells added when the scoreboard runs out of room
+
+
+class Scoreboard():
+    ''' The Scoreboard class paints the result of every bounce, one
+    column per challenge, onto a single sprite in the top-left corner
+    of the screen. '''
+
+    def __init__(self, sprites, size, smiley=None, frown=None):
+        ''' Initialize an empty scoreboard (the reward graphics can be
+        set later) '''
+        self._sprites = sprites
+        self._size = size  # size of a reward graphic
+        self._smiley = smiley
+        self._frown = frown
+        self._labels = []  # column labels, one per challenge
+        self._results = []  # bytearray of results (1 = correct) per column
+        self._surface = None
+        self._spr = None
+        self._columns = 0  # number of columns and rows the surface holds
+        self._rows = 0
+
+    def set_rewards(self, smiley, frown):
+        ''' Set the reward graphics, repainting the results so far '''
+        self._smiley = smiley
+        self._frown = frown
+        if self._surface is not None:
+            self._repaint()
+            self._spr.inval()
+
+    def add_result(self, n, label, correct):
+        ''' Record (and paint) the result of a bounce of challenge n '''
+        while len(self._results) < n + 1:
+            self._labels.append(None)
+            self._results.append(bytearray())
+        if self._labels[n] is None:
+            self._labels[n] = label
+        # Results that would be drawn off screen are not kept.
+        if n >= Gdk.Screen.width() // CELL or \
+           len(self._results[n]) + 1 >= Gdk.Screen.height() // CELL:
+            return
+        self._results[n].append(1 if correct else 0)
+
+        row = len(self._results[n])
+        if n + 1 > self._columns or row + 1 > self._rows:
+            self._grow(max(n + 1, self._columns), max(row + 1, self._rows))
+        else:
+            cr = cairo.Context(self._surface)
+            if row == 1:
+                self._paint_label(cr, n)
+            self._paint_result(cr, n, row - 1)
+            self._spr.inval()
+
+    def _grow(self, columns, rows):
+        ''' Replace the surface with a larger one and repaint it '''
+        self._columns = min(columns + GROW, Gdk.Screen.width() // CELL)
+        self._rows = min(rows + GROW, Gdk.Screen.height() // CELL)
+        self._surface = cairo.ImageSurface(cairo.FORMAT_ARGB32,
+                                           self._columns * CELL,
+                                           self._rows * CELL)
+        self._repaint()
+        if self._spr is None:
+            self._spr = Sprite(self._sprites, 0, 0, self._surface)
+            self._spr.type = 'scoreboard'
+            self._spr.set_layer(-1)
+        else:
+            self._spr.set_shape(self._surface)
+
+    def _repaint(self):
+        ''' Paint every label and result '''
+        cr = cairo.Context(self._surface)
+        cr.save()
+        cr.set_operator(cairo.OPERATOR_CLEAR)
+        cr.paint()
+        cr.restore()
+        for n in range(len(self._results)):
+            if len(self._results[n]) > 0:
+                self._paint_label(cr, n)
+            for i in range(len(self._results[n])):
+                self._paint_result(cr, n, i)
+
+    def _paint_result(self, cr, n, i):
+        ''' Paint the ith result in column n '''
+        if self._results[n][i]:
+            image = self._smiley
+        else:
+            image = self._frown
+        if image is None:  # Not loaded yet
+            return
+        cr.set_source_surface(image, n * CELL, (i + 1) * CELL)
+        cr.rectangle(n * CELL, (i + 1) * CELL, self._size, self._size)
+        cr.fill()
+
+    def _paint_label(self, cr, n):
+        ''' Paint the column label, shrinking it to fit if need be '''
+        fd = Pango.FontDescription('Sans')
+        fd.set_size(12 * Pango.SCALE)
+        pl = PangoCairo.create_layout(cr)
+        pl.set_text(str(self._labels[n]), -1)
+        pl.set_font_description(fd)
+        w = pl.get_size()[0] / Pango.SCALE
+        if w > self._size:
+            fd.set_size(int(12 * Pango.SCALE * self._size / w))
+            pl.set_font_description(fd)
+            w = pl.get_size()[0] / Pango.SCALE
+        h = pl.get_size()[1] / Pango.SCALE
+        cr.save()
+        cr.translate(int(n * CELL + (self._size - w) / 2),
+                     int((self._size - h) / 2))
+        cr.set_source_rgb(0, 0, 0)
+        PangoCairo.update_layout(cr, pl)
+        PangoCairo.show_layout(cr, pl)
+        cr.restore()
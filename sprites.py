@@ -76,14 +76,21 @@ def svg_str_to_pixbuf(svg_string):
 
 '''
 
+from array import array
+from bisect import bisect_left, bisect_right, insort
+
 import cairo
 import gi
 gi.require_version('PangoCairo', '1.0')
-from gi.repository import Gdk
 from gi.repository import GdkPixbuf
+from gi.repository import GLib
 from gi.repository import Pango
 from gi.repository import PangoCairo
 
+from svg_utils import pixbuf_to_surface
+
+GRID_CELL = 128  # size (in pixels) of a cell in the hit-test grid
+
 
 class Sprites:
 
@@ -92,8 +99,67 @@ class Sprites:
     def __init__(self, widget):
         ''' Initialize an empty array of sprites '''
         self.widget = widget
-        self.list = []
         self.cr = None
+        # The (x, y, width, height) of every sprite, four ints per
+        # sprite, so they can be scanned without touching the sprites.
+        self.rects = array('i')
+        self._free_rects = []  # offsets released by discarded sprites
+        self._damage = None  # region to be redrawn on the next frame
+        self._grid = {}  # (column, row) -> sprites overlapping that cell
+        # Sprites placed with set_layer live in per-layer buckets (dicts
+        # keep insertion order); the bucket keys are kept sorted with
+        # bisect. Sprites appended without a layer are drawn last, in
+        # the order they were appended.
+        self._layers = {}
+        self._layer_keys = []
+        self._index = {}  # sprite -> (layer, sequence) for bucket members
+        self._tail = []
+        self._sequence = 0
+
+    @property
+    def list(self):
+        ''' The sprites in drawing order (bottom first) '''
+        return list(self._draw_order())
+
+    def _draw_order(self):
+        for layer in self._layer_keys:
+            for spr in self._layers[layer]:
+                yield spr
+        for spr in self._tail:
+            yield spr
+
+    def allocate_rect(self, x, y):
+        ''' Reserve space for a new sprite's rect; returns its offset '''
+        if self._free_rects:
+            k = self._free_rects.pop()
+            self.rects[k:k + 4] = array('i', (x, y, 0, 0))
+            return k
+        self.rects.extend((x, y, 0, 0))
+        return len(self.rects) - 4
+
+    def release_rect(self, k):
+        ''' Make the rect at offset k available to a new sprite '''
+        self._free_rects.append(k)
+
+    def inval_rect(self, x, y, w, h):
+        ''' Add a rectangle to the region GTK will redraw; the region is
+        queued once, after all of this frame's changes. '''
+        width = self.widget.get_allocated_width()
+        height = self.widget.get_allocated_height()
+        x1, y1 = max(x, 0), max(y, 0)
+        x2, y2 = min(x + w, width), min(y + h, height)
+        if x2 <= x1 or y2 <= y1:  # Nothing on screen
+            return
+        if self._damage is None:
+            self._damage = cairo.Region()
+            GLib.idle_add(self._queue_damage,
+                          priority=GLib.PRIORITY_HIGH_IDLE)
+        self._damage.union(cairo.RectangleInt(x1, y1, x2 - x1, y2 - y1))
+
+    def _queue_damage(self):
+        self.widget.queue_draw_region(self._damage)
+        self._damage = None
+        return False
 
     def set_cairo_context(self, cr):
         ''' Cairo context may be set or reset after __init__ '''
@@ -101,44 +167,105 @@ class Sprites:
 
     def get_sprite(self, i):
         ''' Return a sprint from the array '''
-        if i < 0 or i > len(self.list) - 1:
+        if i < 0 or i > self.length_of_list() - 1:
             return(None)
         else:
             return(self.list[i])
 
     def length_of_list(self):
         ''' How many sprites are there? '''
-        return len(self.list)
+        return len(self._index) + len(self._tail)
 
     def append_to_list(self, spr):
         ''' Append a new sprite to the end of the list. '''
-        self.list.append(spr)
-
-    def insert_in_list(self, spr, i):
-        ''' Insert a sprite at position i. '''
-        if i < 0:
-            self.list.insert(0, spr)
-        elif i > len(self.list) - 1:
-            self.list.append(spr)
+        self._tail.append(spr)
+        self._add_to_grid(spr)
+
+    def insert_by_layer(self, spr):
+        ''' Insert a sprite in front of the others in its layer, but
+        behind any sprite in a higher layer. '''
+        if self._tail and bisect_right(self._layer_keys, spr.layer) == \
+           len(self._layer_keys):
+            # Nothing sorted is above this layer, so it goes among the
+            # appended sprites at the end of the list.
+            for i, other in enumerate(self._tail):
+                if spr.layer < other.layer:
+                    self._tail.insert(i, spr)
+                    break
+            else:
+                self._tail.append(spr)
         else:
-            self.list.insert(i, spr)
+            if spr.layer not in self._layers:
+                insort(self._layer_keys, spr.layer)
+                self._layers[spr.layer] = {}
+            self._sequence += 1
+            self._layers[spr.layer][spr] = None
+            self._index[spr] = (spr.layer, self._sequence)
+        self._add_to_grid(spr)
 
     def remove_from_list(self, spr):
         ''' Remove a sprite from the list. '''
-        if spr in self.list:
-            self.list.remove(spr)
+        if spr in self._index:
+            layer = self._index.pop(spr)[0]
+            del self._layers[layer][spr]
+            if not self._layers[layer]:
+                del self._layers[layer]
+                del self._layer_keys[bisect_left(self._layer_keys, layer)]
+        elif spr in self._tail:
+            self._tail.remove(spr)
+        self._remove_from_grid(spr)
+
+    def _z_order(self, spr):
+        ''' A sort key matching the drawing order '''
+        if spr in self._index:
+            return (0,) + self._index[spr]
+        return (1, self._tail.index(spr), 0)
+
+    def update_grid(self, spr):
+        ''' Reindex a sprite after its position or size has changed. '''
+        if spr.cells is not None:
+            self._remove_from_grid(spr)
+            self._add_to_grid(spr)
+
+    def _add_to_grid(self, spr):
+        ''' Record the sprite in every grid cell its rect overlaps. '''
+        x, y, w, h = spr.rect
+        cells = []
+        for column in range(x // GRID_CELL, (x + w) // GRID_CELL + 1):
+            for row in range(y // GRID_CELL, (y + h) // GRID_CELL + 1):
+                cell = (column, row)
+                if cell not in self._grid:
+                    self._grid[cell] = set()
+                self._grid[cell].add(spr)
+                cells.append(cell)
+        spr.cells = cells
+
+    def _remove_from_grid(self, spr):
+        ''' Forget the grid cells recorded for the sprite. '''
+        if spr.cells is None:
+            return
+        for cell in spr.cells:
+            self._grid[cell].discard(spr)
+            if not self._grid[cell]:
+                del self._grid[cell]
+        spr.cells = None
 
     def find_sprite(self, pos):
         ''' Search based on (x, y) position. Return the 'top/first' one. '''
-        list = self.list[:]
-        list.reverse()
-        for spr in list:
-            if spr.hit(pos):
-                return spr
-        return None
+        cell = (int(pos[0]) // GRID_CELL, int(pos[1]) // GRID_CELL)
+        if cell not in self._grid:
+            return None
+        hits = [spr for spr in self._grid[cell]
+                if spr.visible and spr.hit(pos)]
+        if not hits:
+            return None
+        if len(hits) == 1:
+            return hits[0]
+        return max(hits, key=self._z_order)
 
     def redraw_sprites(self, area=None, cr=None):
-        ''' Redraw the sprites that intersect area. '''
+        ''' Redraw the sprites that intersect area (by default, the
+        region Cairo is clipped to). '''
         # I think I need to do this to save Cairo some work
         if cr is None:
             cr = self.cr
@@ -147,87 +274,169 @@ class Sprites:
         if cr is None:
             print('sprites.redraw_sprites: no Cairo context')
             return
-        for spr in self.list:
-            if area is None:
-                spr.draw(cr=cr)
-            else:
-                intersection = spr.rect.intersect(area)
-                if intersection.width > 0 or intersection.height > 0:
+        if area is None:
+            areas = _clip_rectangles(cr)
+        else:
+            areas = [(area.x, area.y, area.width, area.height)]
+            cr.save()
+            cr.rectangle(*areas[0])
+            cr.clip()
+        rects = self.rects
+        allocation = (0, 0, self.widget.get_allocated_width(),
+                      self.widget.get_allocated_height())
+        for spr in self._draw_order():
+            k = spr._slot
+            if not spr.visible or \
+               not _intersects(rects[k:k + 4], allocation):
+                continue
+            for rect in areas:
+                if _intersects(rects[k:k + 4], rect):
                     spr.draw(cr=cr)
+                    break
+        if area is not None:
+            cr.restore()
+
+
+def _clip_rectangles(cr):
+    ''' Return the damaged rectangles Cairo is clipped to '''
+    try:
+        return [(r.x, r.y, r.width, r.height)
+                for r in cr.copy_clip_rectangle_list()]
+    except cairo.Error:  # The clip is not a union of rectangles
+        x1, y1, x2, y2 = cr.clip_extents()
+        return [(x1, y1, x2 - x1, y2 - y1)]
+
+
+def _intersects(a, b):
+    ''' Do two (x, y, width, height) rectangles overlap? '''
+    return a[0] < b[0] + b[2] and b[0] < a[0] + a[2] and \
+        a[1] < b[1] + b[3] and b[1] < a[1] + a[3]
+
+
+class _LabelAttributes:
+
+    ''' How one label is drawn: allocated only for sprites with labels '''
+
+    __slots__ = ('scale', 'rescale', 'horiz_align', 'vert_align', 'x_pos',
+                 'y_pos')
+
+    def __init__(self, scale=12, rescale=True, horiz_align='center',
+                 vert_align='middle', x_pos=None, y_pos=None):
+        self.scale = scale
+        self.rescale = rescale
+        self.horiz_align = horiz_align
+        self.vert_align = vert_align
+        self.x_pos = x_pos
+        self.y_pos = y_pos
+
+    def copy(self):
+        return _LabelAttributes(self.scale, self.rescale, self.horiz_align,
+                                self.vert_align, self.x_pos, self.y_pos)
 
 
 class Sprite:
 
     ''' A class for the individual sprites '''
 
+    __slots__ = ('_sprites', '_slot', 'save_xy', 'layer', 'type', 'cells',
+                 'visible',
+                 'images', '_sources', '_composite', '_clip', 'labels',
+                 '_label_attributes', '_colors', '_fd', '_margins')
+
     def __init__(self, sprites, x, y, image):
         ''' Initialize an individual sprite '''
         self._sprites = sprites
+        self._slot = sprites.allocate_rect(int(x), int(y))
         self.save_xy = (x, y)  # remember initial (x, y) position
-        self.rect = [int(x), int(y), 0, 0]
-        self._scale = [12]
-        self._rescale = [True]
-        self._horiz_align = ['center']
-        self._vert_align = ['middle']
-        self._x_pos = [None]
-        self._y_pos = [None]
-        self._fd = None
-        self._bold = False
-        self._italic = False
-        self._colors = []
-        self._margins = [0, 0, 0, 0]
         self.layer = 100
-        self.labels = []
-        self.images = []
-        self._dx = []  # image offsets
-        self._dy = []
         self.type = None
+        self.cells = None  # hit-test grid cells (None when not listed)
+        self.visible = True
+        self.images = []
+        self._sources = []  # [Cairo surface, dx, dy] for each image
+        self._composite = None  # images and labels flattened for drawing
+        self._clip = None  # (x, y) of the part of the image shown, if any
+        # Most sprites never have a label, so the label storage is
+        # only created by the first call to _extend_labels_array.
+        self.labels = ()
+        self._label_attributes = None
+        self._colors = None
+        self._fd = None
+        self._margins = (0, 0, 0, 0)
         self.set_image(image)
         self._sprites.append_to_list(self)
 
+    def __del__(self):
+        # Only sprites no longer in the list (e.g., hidden ones) can be
+        # collected, so the rect is free for the next new sprite.
+        try:
+            self._sprites.release_rect(self._slot)
+        except AttributeError:  # __init__ did not get that far
+            pass
+
+    @property
+    def rect(self):
+        ''' The (x, y, width, height) of the sprite '''
+        return tuple(self._sprites.rects[self._slot:self._slot + 4])
+
     def set_image(self, image, i=0, dx=0, dy=0):
         ''' Add an image to the sprite. '''
         while len(self.images) < i + 1:
             self.images.append(None)
-            self._dx.append(0)
-            self._dy.append(0)
+            self._sources.append([None, 0, 0])
         self.images[i] = image
-        self._dx[i] = dx
-        self._dy[i] = dy
-        if hasattr(self.images[i], 'get_width'):
-            w = self.images[i].get_width()
-            h = self.images[i].get_height()
+        self._composite = None
+        if isinstance(image, GdkPixbuf.Pixbuf):
+            # Convert once, rather than on every draw
+            surface = pixbuf_to_surface(image)
+        elif isinstance(image, cairo.ImageSurface):
+            surface = image
+        else:
+            surface = None
+        self._sources[i] = [surface, dx, dy]
+        if hasattr(image, 'get_width'):
+            w = image.get_width()
+            h = image.get_height()
         else:
-            w, h = self.images[i].get_size()
+            w, h = image.get_size()
+        rects = self._sprites.rects
+        k = self._slot
         if i == 0:  # Always reset width and height when base image changes.
-            self.rect[2] = w + dx
-            self.rect[3] = h + dy
+            self._clip = None
+            rects[k + 2] = w + dx
+            rects[k + 3] = h + dy
         else:
-            if w + dx > self.rect[2]:
-                self.rect[2] = w + dx
-            if h + dy > self.rect[3]:
-                self.rect[3] = h + dy
+            if w + dx > rects[k + 2]:
+                rects[k + 2] = w + dx
+            if h + dy > rects[k + 3]:
+                rects[k + 3] = h + dy
+        self._sprites.update_grid(self)
 
     def move(self, pos):
         ''' Move to new (x, y) position '''
         self.inval()
-        self.rect[0], self.rect[1] = int(pos[0]), int(pos[1])
+        self._sprites.rects[self._slot] = int(pos[0])
+        self._sprites.rects[self._slot + 1] = int(pos[1])
+        self._sprites.update_grid(self)
         self.inval()
 
     def move_relative(self, pos):
         ''' Move to new (x+dx, y+dy) position '''
         self.inval()
-        self.rect[0] += int(pos[0])
-        self.rect[1] += int(pos[1])
+        self._sprites.rects[self._slot] += int(pos[0])
+        self._sprites.rects[self._slot + 1] += int(pos[1])
+        self._sprites.update_grid(self)
         self.inval()
 
     def get_xy(self):
         ''' Return current (x, y) position '''
-        return (self.rect[0], self.rect[1])
+        return (self._sprites.rects[self._slot],
+                self._sprites.rects[self._slot + 1])
 
     def get_dimensions(self):
         ''' Return current size '''
-        return (self.rect[2], self.rect[3])
+        return (self._sprites.rects[self._slot + 2],
+                self._sprites.rects[self._slot + 3])
 
     def get_layer(self):
         ''' Return current layer '''
@@ -239,54 +448,67 @@ class Sprite:
         self.set_image(image, i)
         self.inval()
 
+    def set_source_rect(self, x, y, w, h):
+        ''' Show only the w x h part of the image at (x, y), e.g., one
+        frame of a sprite sheet '''
+        self.inval()
+        self._clip = (x, y)
+        rects = self._sprites.rects
+        rects[self._slot + 2] = w
+        rects[self._slot + 3] = h
+        self._sprites.update_grid(self)
+        self.inval()
+
     def set_layer(self, layer=None):
         ''' Set the layer for a sprite '''
         self._sprites.remove_from_list(self)
         if layer is not None:
             self.layer = layer
-        for i in range(self._sprites.length_of_list()):
-            if self.layer < self._sprites.get_sprite(i).layer:
-                self._sprites.insert_in_list(self, i)
-                self.inval()
-                return
-        self._sprites.append_to_list(self)
+        self._sprites.insert_by_layer(self)
         self.inval()
 
     def set_label(self, new_label, i=0):
         ''' Set the label drawn on the sprite '''
         self._extend_labels_array(i)
-        if type(new_label) is str:
+        if isinstance(new_label, str):
             # pango doesn't like nulls
             self.labels[i] = new_label.replace('\0', ' ')
         else:
             self.labels[i] = str(new_label)
+        self._composite = None
         self.inval()
 
     def set_margins(self, l=0, t=0, r=0, b=0):
         ''' Set the margins for drawing the label '''
-        self._margins = [l, t, r, b]
+        self._margins = (l, t, r, b)
+        self._composite = None
 
     def _extend_colors_array(self, i):
+        if self._colors is None:
+            self._colors = []
         while len(self._colors) < i + 1:
-            self._colors.append([0., 0., 0.])
+            self._colors.append((0., 0., 0.))
 
     def _extend_labels_array(self, i):
         ''' Append to the labels attribute list '''
         if self._fd is None:
             self.set_font('Sans')
+        if self._label_attributes is None:
+            self.labels = []
+            self._label_attributes = []
         while len(self.labels) < i + 1:
             self.labels.append(' ')
-            self._scale.append(self._scale[0])
-            self._rescale.append(self._rescale[0])
-            self._horiz_align.append(self._horiz_align[0])
-            self._vert_align.append(self._vert_align[0])
-            self._x_pos.append(self._x_pos[0])
-            self._y_pos.append(self._y_pos[0])
+            if self._label_attributes:
+                self._label_attributes.append(
+                    self._label_attributes[0].copy())
+            else:
+                self._label_attributes.append(_LabelAttributes())
         self._extend_colors_array(i)
 
     def set_font(self, font):
         ''' Set the font for a label '''
         self._fd = Pango.FontDescription(font)
+        self._composite = None
 
     def set_label_color(self, rgb, i=0):
         ''' Set the font color for a label '''
@@ -299,21 +521,19 @@ class Sprite:
             rgb = COLORTABLE[rgb.lower()]
         # Convert from '#RRGGBB' to floats
         self._extend_colors_array(i)
-        self._colors[i] = [int('0x' + rgb[1:3], 16) / 256.,
+        self._colors[i] = (int('0x' + rgb[1:3], 16) / 256.,
                            int('0x' + rgb[3:5], 16) / 256.,
-                           int('0x' + rgb[5:7], 16) / 256.]
+                           int('0x' + rgb[5:7], 16) / 256.)
+        self._composite = None
         return
 
     def set_label_attributes(self, scale, rescale=True, horiz_align='center',
                              vert_align='middle', x_pos=None, y_pos=None, i=0):
         ''' Set the various label attributes '''
         self._extend_labels_array(i)
-        self._scale[i] = scale
-        self._rescale[i] = rescale
-        self._horiz_align[i] = horiz_align
-        self._vert_align[i] = vert_align
-        self._x_pos[i] = x_pos
-        self._y_pos[i] = y_pos
+        self._label_attributes[i] = _LabelAttributes(
+            scale, rescale, horiz_align, vert_align, x_pos, y_pos)
+        self._composite = None
 
     def hide(self):
         ''' Hide a sprite '''
@@ -324,13 +544,20 @@ class Sprite:
         ''' Restore a hidden sprite '''
         self.set_layer()
 
+    def set_visible(self, visible):
+        ''' Show or hide the sprite, keeping its place in the list '''
+        if visible == self.visible:
+            return
+        if not visible:
+            self.inval()
+        self.visible = visible
+        if visible:
+            self.inval()
+
     def inval(self):
         ''' Invalidate a region for gtk '''
-        # self._sprites.window.invalidate_rect(self.rect, False)
-        self._sprites.widget.queue_draw_area(self.rect[0],
-                                             self.rect[1],
-                                             self.rect[2],
-                                             self.rect[3])
+        if self.visible:
+            self._sprites.inval_rect(*self.rect)
 
     def draw(self, cr=None):
         ''' Draw the sprite (and label) '''
@@ -339,58 +566,80 @@ class Sprite:
         if cr is None:
             print('sprite.draw: no Cairo context.')
             return
-        for i, img in enumerate(self.images):
-            if isinstance(img, GdkPixbuf.Pixbuf):
-                Gdk.cairo_set_source_pixbuf(cr, img,
-                                            self.rect[0] + self._dx[i],
-                                            self.rect[1] + self._dy[i])
-                cr.rectangle(self.rect[0] + self._dx[i],
-                             self.rect[1] + self._dy[i],
-                             self.rect[2],
-                             self.rect[3])
-                cr.fill()
-            elif type(img) == cairo.ImageSurface:
-                cr.set_source_surface(img, self.rect[0] + self._dx[i],
-                                      self.rect[1] + self._dy[i])
-                cr.rectangle(self.rect[0] + self._dx[i],
-                             self.rect[1] + self._dy[i],
-                             self.rect[2],
-                             self.rect[3])
-                cr.fill()
-            else:
-                print('sprite.draw: source not a pixbuf (%s)' % (type(img)))
+        if self._composite is None:
+            self._composite = self._flatten()
+        x, y, w, h = self.rect
+        if self._clip is None:
+            cr.set_source_surface(self._composite, x, y)
+        else:
+            cr.set_source_surface(self._composite, x - self._clip[0],
+                                  y - self._clip[1])
+        cr.rectangle(x, y, w, h)
+        cr.fill()
+
+    def _flatten(self):
+        ''' Render the images and labels into a single surface, which is
+        reused until one of them changes. '''
+        if len(self.labels) == 0 and len(self._sources) == 1 and \
+           self._sources[0][0] is not None and \
+           self._sources[0][1] == 0 and self._sources[0][2] == 0:
+            return self._sources[0][0]  # Nothing to flatten
+        if self._clip is None:
+            w, h = self.get_dimensions()
+        else:  # Flatten all of the image, not just the part shown
+            w = max([image.get_width() + dx
+                     for image, dx, dy in self._sources if image is not None],
+                    default=0)
+            h = max([image.get_height() + dy
+                     for image, dx, dy in self._sources if image is not None],
+                    default=0)
+        surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, w, h)
+        cr = cairo.Context(surface)
+        for i, (image, dx, dy) in enumerate(self._sources):
+            if image is None:
+                print('sprite.draw: source not a pixbuf (%s)' %
+                      (type(self.images[i])))
+                continue
+            cr.set_source_surface(image, dx, dy)
+            cr.paint()
         if len(self.labels) > 0:
-            self.draw_label(cr)
+            self.draw_label(cr, origin=(0, 0))
+        return surface
 
     def hit(self, pos):
         ''' Is (x, y) on top of the sprite? '''
         x, y = pos
-        if x < self.rect[0]:
+        x0, y0, w, h = self.rect
+        if x < x0:
             return False
-        if x > self.rect[0] + self.rect[2]:
+        if x > x0 + w:
             return False
-        if y < self.rect[1]:
+        if y < y0:
             return False
-        if y > self.rect[1] + self.rect[3]:
+        if y > y0 + h:
             return False
         return True
 
-    def draw_label(self, cr):
+    def draw_label(self, cr, origin=None):
         ''' Draw the label based on its attributes '''
-        my_width = self.rect[2] - self._margins[0] - self._margins[2]
+        x0, y0, width, height = self.rect
+        if origin is not None:
+            x0, y0 = origin
+        my_width = width - self._margins[0] - self._margins[2]
         if my_width < 0:
             my_width = 0
-        my_height = self.rect[3] - self._margins[1] - self._margins[3]
+        my_height = height - self._margins[1] - self._margins[3]
         for i in range(len(self.labels)):
+            attributes = self._label_attributes[i]
             pl = PangoCairo.create_layout(cr)
             pl.set_text(str(self.labels[i]), -1)
-            self._fd.set_size(int(self._scale[i] * Pango.SCALE))
+            self._fd.set_size(int(attributes.scale * Pango.SCALE))
             pl.set_font_description(self._fd)
             w = pl.get_size()[0] / Pango.SCALE
             if w > my_width:
-                if self._rescale[i]:
+                if attributes.rescale:
                     self._fd.set_size(
-                        int(self._scale[i] * Pango.SCALE * my_width / w))
+                        int(attributes.scale * Pango.SCALE * my_width / w))
                     pl.set_font_description(self._fd)
                     w = pl.get_size()[0] / Pango.SCALE
                 else:
@@ -398,27 +647,27 @@ class Sprite:
                     while(w > my_width and j > 0):
                         pl.set_text(
                             "…" + self.labels[i][len(self.labels[i]) - j:], -1)
-                        self._fd.set_size(int(self._scale[i] * Pango.SCALE))
+                        self._fd.set_size(int(attributes.scale * Pango.SCALE))
                         pl.set_font_description(self._fd)
                         w = pl.get_size()[0] / Pango.SCALE
                         j -= 1
-            if self._x_pos[i] is not None:
-                x = int(self.rect[0] + self._x_pos[i])
-            elif self._horiz_align[i] == 'center':
-                x = int(self.rect[0] + self._margins[0] + (my_width - w) / 2)
-            elif self._horiz_align[i] == 'left':
-                x = int(self.rect[0] + self._margins[0])
+            if attributes.x_pos is not None:
+                x = int(x0 + attributes.x_pos)
+            elif attributes.horiz_align == 'center':
+                x = int(x0 + self._margins[0] + (my_width - w) / 2)
+            elif attributes.horiz_align == 'left':
+                x = int(x0 + self._margins[0])
             else:  # right
-                x = int(self.rect[0] + self.rect[2] - w - self._margins[2])
+                x = int(x0 + width - w - self._margins[2])
             h = pl.get_size()[1] / Pango.SCALE
-            if self._y_pos[i] is not None:
-                y = int(self.rect[1] + self._y_pos[i])
-            elif self._vert_align[i] == 'middle':
-                y = int(self.rect[1] + self._margins[1] + (my_height - h) / 2)
-            elif self._vert_align[i] == 'top':
-                y = int(self.rect[1] + self._margins[1])
+            if attributes.y_pos is not None:
+                y = int(y0 + attributes.y_pos)
+            elif attributes.vert_align == 'middle':
+                y = int(y0 + self._margins[1] + (my_height - h) / 2)
+            elif attributes.vert_align == 'top':
+                y = int(y0 + self._margins[1])
             else:  # bottom
-                y = int(self.rect[1] + self.rect[3] - h - self._margins[3])
+                y = int(y0 + height - h - self._margins[3])
             cr.save()
             cr.translate(x, y)
             cr.set_source_rgb(self._colors[i][0], self._colors[i][1],
@@ -436,7 +685,8 @@ class Sprite:
         for i in range(len(self.labels)):
             pl = PangoCairo.create_layout(cr)
             pl.set_text(str(self.labels[i]), -1)
-            self._fd.set_size(int(self._scale[i] * Pango.SCALE))
+            self._fd.set_size(
+                int(self._label_attributes[i].scale * Pango.SCALE))
             pl.set_font_description(self._fd)
             w = pl.get_size()[0] / Pango.SCALE
             if w > max:
@@ -445,11 +695,11 @@ class Sprite:
 
     def label_safe_width(self):
         ''' Return maximum width for a label '''
-        return self.rect[2] - self._margins[0] - self._margins[2]
+        return self.get_dimensions()[0] - self._margins[0] - self._margins[2]
 
     def label_safe_height(self):
         ''' Return maximum height for a label '''
-        return self.rect[3] - self._margins[1] - self._margins[3]
+        return self.get_dimensions()[1] - self._margins[1] - self._margins[3]
 
     def label_left_top(self):
         ''' Return the upper-left corner of the label safe zone '''
@@ -458,8 +708,11 @@ class Sprite:
     def get_pixel(self, pos, i=0):
         ''' Return the pixl at (x, y) '''
         x, y = pos
-        x = x - self.rect[0]
-        y = y - self.rect[1]
+        x = x - self.get_xy()[0]
+        y = y - self.get_xy()[1]
+        if self._clip is not None:
+            x += self._clip[0]
+            y += self._clip[1]
         if y > self.images[i].get_height() - 1:
             return(-1, -1, -1, -1)
         try:
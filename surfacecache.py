@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2026, FractionBounce contributors
+
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# You should have received a copy of the GNU General Public License
+# along with this library; if not, write to the Free Software
+# Foundation, 51 Franklin Street, Suite 500 Boston, MA 02110-1335 USA
+
+'''
+surfacecache.py keeps rendered graphics on disk as raw, premultiplied
+Cairo pixels, so that later launches of the activity (and other
+instances running at the same time) can map them straight into Cairo
+image surfaces instead of rasterizing and decoding them again.
+
+Each file is a small header (magic, Cairo format, width, height,
+stride) followed by the pixel data.  Files are mapped copy-on-write,
+so the pages are shared between processes until one of them draws on
+its surface.
+
+The directory is kept under SURFACE_CACHE_BUDGET bytes: loading a
+file touches its modification time, and when the budget is exceeded
+the files used least recently are removed.  (A removed file stays
+mapped for as long as a surface uses it.)
+'''
+
+import os
+import mmap
+import struct
+import threading
+from hashlib import sha1
+
+import cairo
+
+import logging
+_logger = logging.getLogger('fractionbounce-activity')
+
+MAGIC = b'FBS1'
+HEADER = struct.Struct('<4siiii')  # magic, format, width, height, stride
+SURFACE_CACHE_BUDGET = 64 * 1024 * 1024  # bytes on disk
+# Part of every key: bump it whenever the way a cached graphic is
+# rendered changes, so surfaces rendered by older code are not used
+# (the budget then prunes them).
+RENDER_VERSION = 1
+
+
+def file_key(path):
+    ''' Identify a file on disk by its name, size and modification time '''
+    st = os.stat(path)
+    return ('%s:%d:%d' % (path, st.st_size, st.st_mtime_ns)).encode()
+
+
+class SurfaceCache():
+    ''' A directory of rendered surfaces, keyed by a hash of the asset,
+    RENDER_VERSION, the size it is rendered at and its scale '''
+
+    def __init__(self):
+        self._path = None  # Nothing is cached until a path is set.
+        self._size = 0  # bytes in the directory
+        self._lock = threading.Lock()  # surfaces are saved from workers
+
+    def set_path(self, path):
+        ''' Set (and create) the directory the surfaces are kept in '''
+        try:
+            os.makedirs(path, exist_ok=True)
+        except OSError as e:
+            _logger.error('Could not create surface cache %s: %s' % (path, e))
+            return
+        self._path = path
+        self._prune()
+
+    def get(self, asset, render, size=None, scale=1.0):
+        ''' Return the surface for asset (the bytes that identify it),
+        calling render() to draw it if it is not on disk yet '''
+        if self._path is None:
+            return render()
+        key = sha1(asset)
+        key.update(repr((RENDER_VERSION, size, scale)).encode())
+        name = key.hexdigest()
+        filename = os.path.join(self._path, name + '.surface')
+        surface = self._load(filename)
+        if surface is None:
+            surface = render()
+            self._save(filename, surface)
+        return surface
+
+    def _load(self, filename):
+        try:
+            fd = open(filename, 'rb')
+        except OSError:
+            return None
+        try:
+            with fd:
+                data = mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_COPY)
+            magic, surface_format, width, height, stride = \
+                HEADER.unpack_from(data)
+            if magic != MAGIC or \
+               len(data) != HEADER.size + stride * height:
+                raise ValueError('bad header')
+            os.utime(filename)  # Recently used, so pruned last
+            return cairo.ImageSurface.create_for_data(
+                memoryview(data)[HEADER.size:], cairo.Format(surface_format),
+                width, height, stride)
+        except (OSError, ValueError, struct.error, cairo.Error) as e:
+            _logger.error('Could not load surface %s: %s' % (filename, e))
+            return None
+
+    def _save(self, filename, surface):
+        # Write to a temporary file and rename it, so another instance
+        # never maps a half-written surface.
+        surface.flush()
+        tmp = '%s.%d.%d' % (filename, os.getpid(), threading.get_ident())
+        try:
+            with open(tmp, 'wb') as fd:
+                fd.write(HEADER.pack(MAGIC, surface.get_format(),
+                                     surface.get_width(),
+                                     surface.get_height(),
+                                     surface.get_stride()))
+                fd.write(surface.get_data())
+            os.replace(tmp, filename)
+        except OSError as e:
+            _logger.error('Could not save surface %s: %s' % (filename, e))
+            return
+        with self._lock:
+            self._size += HEADER.size + len(surface.get_data())
+            over = self._size > SURFACE_CACHE_BUDGET
+        if over:
+            self._prune()
+
+    def _prune(self):
+        ''' Remove the least recently used surfaces until the directory
+        fits in SURFACE_CACHE_BUDGET '''
+        with self._lock:
+            entries = []
+            try:
+                with os.scandir(self._path) as it:
+                    for entry in it:
+                        if entry.name.endswith('.surface'):
+                            st = entry.stat()
+                            entries.append((st.st_mtime_ns, st.st_size,
+                                            entry.path))
+            except OSError as e:
+                _logger.error('Could not scan surface cache %s: %s' %
+                              (self._path, e))
+                return
+            entries.sort()
+            self._size = sum(size for mtime, size, path in entries)
+            for mtime, size, path in entries:
+                if self._size <= SURFACE_CACHE_BUDGET:
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                self._size -= size
+
+
+surface_cache = SurfaceCache()
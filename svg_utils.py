@@ -9,39 +9,75 @@
 # You should have received a copy of the GNU General Public License
 # along with this library; if not, write to the Free Software
 # Foundation, 51 Franklin Street, Suite 500 Boston, MA 02110-1335 USA
-from gi.repository import GdkPixbuf
+import cairo
 
+from gi.repository import Gdk, GdkPixbuf
+
+from collections import OrderedDict
+from hashlib import sha1
 from math import sin, cos, pi
+import threading
+
+from surfacecache import surface_cache
+
+RASTER_CACHE_BUDGET = 16 * 1024 * 1024  # bytes of rasterized SVG to keep
+
+
+class RasterCache():
+    ''' A least-recently-used cache of the pixbufs rasterized from SVG,
+    keyed by a hash of the SVG source and limited to budget bytes '''
+
+    def __init__(self, budget=RASTER_CACHE_BUDGET):
+        self.budget = budget
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._pixbufs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def set_budget(self, budget):
+        ''' Change the budget, evicting pixbufs if need be '''
+        with self._lock:
+            self.budget = budget
+            self._evict()
 
+    def lookup(self, key):
+        ''' Return the pixbuf stored under key, or None '''
+        with self._lock:
+            if key not in self._pixbufs:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._pixbufs.move_to_end(key)
+            return self._pixbufs[key]
 
-def generate_ball_svg(path):
-    ''' Returns an SVG string of a ball + label with image from path '''
-    return \
-        '<?xml version="1.0" encoding="UTF-8" standalone="no"?>\n' + \
-        '<svg\n' + \
-        'xmlns:dc="http://purl.org/dc/elements/1.1/"\n' + \
-        'xmlns:cc="http://creativecommons.org/ns#"\n' + \
-        'xmlns:rdf="http://www.w3.org/1999/02/22-rdf-syntax-ns#"\n' + \
-        'xmlns:svg="http://www.w3.org/2000/svg"\n' + \
-        'xmlns="http://www.w3.org/2000/svg"\n' + \
-        'xmlns:xlink="http://www.w3.org/1999/xlink"\n' + \
-        'version="1.1"\n' + \
-        'width="85"\n' + \
-        'height="120">\n' + \
-        '<image\n' + \
-        'xlink:href="file://%s"\n' % path + \
-        'x="0"\n' + \
-        'y="35"\n' + \
-        'width="85"\n' + \
-        'height="85" />\n' + \
-        '<rect\n' + \
-        'width="85"\n' + \
-        'height="35"\n' + \
-        'ry="7.75"\n' + \
-        'x="0"\n' + \
-        'y="0"\n' + \
-        'style="fill:#ffffff;fill-opacity:1;stroke:none" />\n' + \
-        '</svg>'
+    def store(self, key, pixbuf):
+        ''' Keep a pixbuf, unless it would not fit in the budget '''
+        size = pixbuf.get_rowstride() * pixbuf.get_height()
+        if size > self.budget:
+            return
+        with self._lock:
+            if key in self._pixbufs:
+                return
+            self._pixbufs[key] = pixbuf
+            self.size += size
+            self._evict()
+
+    def _evict(self):
+        while self.size > self.budget and self._pixbufs:
+            pixbuf = self._pixbufs.popitem(last=False)[1]
+            self.size -= pixbuf.get_rowstride() * pixbuf.get_height()
+            self.evictions += 1
+
+    def stats(self):
+        ''' Return the cache counters '''
+        return {'hits': self.hits, 'misses': self.misses,
+                'evictions': self.evictions, 'size': self.size,
+                'entries': len(self._pixbufs)}
+
+
+raster_cache = RasterCache()
 
 
 def generate_xo_svg(scale=1.0, colors=["#C0C0C0", "#282828"]):
@@ -52,12 +88,53 @@ def generate_xo_svg(scale=1.0, colors=["#C0C0C0", "#282828"]):
 
 
 def svg_str_to_pixbuf(v):
-    ''' Load pixbuf from SVG string '''
+    ''' Load pixbuf from SVG string (or bytes, or a memoryview), reusing
+    the pixbuf if the same SVG has been rasterized before '''
+    if isinstance(v, str):
+        v = v.encode()
+    key = sha1(v).digest()
+    pixbuf = raster_cache.lookup(key)
+    if pixbuf is None:
+        pixbuf = rasterize_svg(v)
+        raster_cache.store(key, pixbuf)
+    return pixbuf
+
+
+def rasterize_svg(v):
+    ''' Load pixbuf from SVG bytes with librsvg, bypassing the caches '''
     pl = GdkPixbuf.PixbufLoader.new_with_type('svg')
-    pl.write(v.encode())
+    pl.write(bytes(v))
     pl.close()
-    pixbuf = pl.get_pixbuf()
-    return pixbuf
+    return pl.get_pixbuf()
+
+
+def svg_str_to_surface(v):
+    ''' Load a Cairo surface from SVG string, through the on-disk
+    surface cache (the surface is what is kept, so the pixbuf does not
+    go into the raster cache) '''
+    if isinstance(v, str):
+        v = v.encode()
+    return surface_cache.get(v, lambda: pixbuf_to_surface(rasterize_svg(v)))
+
+
+def pixbuf_to_surface(pixbuf):
+    ''' Convert a pixbuf to a (premultiplied) Cairo image surface '''
+    if pixbuf.get_has_alpha():
+        surface_format = cairo.FORMAT_ARGB32
+    else:
+        surface_format = cairo.FORMAT_RGB24
+    surface = cairo.ImageSurface(surface_format, pixbuf.get_width(),
+                                 pixbuf.get_height())
+    cr = cairo.Context(surface)
+    Gdk.cairo_set_source_pixbuf(cr, pixbuf, 0, 0)
+    cr.paint()
+    return surface
+
+
+def color_to_rgb(color):
+    ''' Convert '#RRGGBB' to Cairo floats '''
+    return (int(color[1:3], 16) / 255., int(color[3:5], 16) / 255.,
+            int(color[5:7], 16) / 255.)
 
 
 def svg_sector(x, y, r, a, fill, stroke):
@@ -85,6 +162,43 @@ def svg_wedge(w, h, dx, dyl, dyr, fill, stroke, stroke_width=3.5):
     return v
 
 
+def svg_wedge_bar(nsegments, w, h, stroke_width=3.5):
+    ''' Returns an SVG bar of n wedges, w wide and rising to h (plus the
+    stroke width); bar.py paints the same bar with Cairo '''
+    s = stroke_width
+    dx = w / float(nsegments)
+    dy = h / float(nsegments)
+    v = svg_header(w, h + s, 1.0)
+    for i in range(int(nsegments) // 2):
+        v += svg_wedge(dx, h + s, i * 2 * dx + s,
+                       i * 2 * dy + s, (i * 2 + 1) * dy + s,
+                       '#000000', '#FFFFFF')
+        v += svg_wedge(dx, h + s, (i * 2 + 1) * dx + s,
+                       (i * 2 + 1) * dy + s, (i * 2 + 2) * dy + s,
+                       '#000000', '#FFFFFF')
+    if int(nsegments) % 2 == 1:  # odd
+        v += svg_wedge(dx, h + s, (i * 2 + 2) * dx + s,
+                       (i * 2 + 2) * dy + s, h + s,
+                       '#000000', '#FFFFFF')
+    return v + svg_footer()
+
+
+def svg_wedge_mark(ball_size, w, h, stroke_width=3.5):
+    ''' Returns the SVG mark for a ball of ball_size on an SVG bar w
+    wide and rising to h '''
+    s = stroke_width
+    dx = ball_size / 2.
+    n = (w - ball_size) / dx
+    dy = h / n
+    i = int(n / 2) - 1
+    v = svg_header(ball_size, h + s, 1.0)
+    v += svg_wedge(dx, h + s, s, i * 2 * dy + s, (i * 2 + 1) * dy + s,
+                   '#FF0000', '#FFFFFF')
+    v += svg_wedge(dx, h + s, dx + s, (i * 2 + 1) * dy + s,
+                   (i * 2 + 2) * dy + s, '#FF0000', '#FFFFFF')
+    return v + svg_footer()
+
+
 def svg_rect(w, h, rx, ry, x, y, fill, stroke):
     ''' Returns an SVG rectangle '''
     v = '       <rect\n'
@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2026, FractionBounce contributors
+
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# You should have received a copy of the GNU General Public License
+# along with this library; if not, write to the Free Software
+# Foundation, 51 Franklin Street, Suite 500 Boston, MA 02110-1335 USA
+
+'''
+The bars and the mark painted with Cairo should look like the SVG
+wedges they replaced, as rasterized by librsvg.
+'''
+
+import os
+import sys
+
+import pytest
+
+pytest.importorskip('gi')
+pytest.importorskip('sugar3.graphics.style')
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bar import BAR_HEIGHT, _render_base, _render_bar, _render_mark
+from svg_utils import (svg_wedge_bar, svg_wedge_mark, rasterize_svg,
+                       pixbuf_to_surface)
+
+WIDTH = 1200
+SCALE = 1.0
+BALL_SIZE = 85
+S = 3.5  # the stroke provision of the wedges
+
+
+def _rasterize(svg):
+    return pixbuf_to_surface(rasterize_svg(svg.encode()))
+
+
+def _assert_similar(expected, actual):
+    ''' Compare the pixels the two surfaces have in common: antialiasing
+    may differ along the edges, but the shapes must match '''
+    w = min(expected.get_width(), actual.get_width())
+    h = min(expected.get_height(), actual.get_height())
+    assert abs(expected.get_width() - actual.get_width()) <= 1
+    assert abs(expected.get_height() - actual.get_height()) <= 1
+    expected.flush()
+    actual.flush()
+    a = expected.get_data()
+    b = actual.get_data()
+    total = 0
+    far = 0
+    for y in range(h):
+        i = y * expected.get_stride()
+        j = y * actual.get_stride()
+        for x in range(w * 4):
+            d = abs(a[i + x] - b[j + x])
+            total += d
+            if d > 64:
+                far += 1
+    assert total / float(w * h * 4) < 4
+    assert far / float(w * h * 4) < 0.01
+
+
+def _gap_centre(surface, y, x1, x2):
+    ''' The centre of the white pixels in [x1, x2) of row y, or None if
+    there are none '''
+    data = surface.get_data()
+    row = y * surface.get_stride()
+    total = 0
+    moment = 0
+    for x in range(x1, x2):
+        brightness = sum(data[row + 4 * x:row + 4 * x + 3])
+        total += brightness
+        moment += brightness * x
+    if total < 255:
+        return None
+    return moment / float(total)
+
+
+def _assert_gaps(expected, actual, nsegments):
+    ''' The white gaps between segments must be where the SVG has
+    them, measured a few pixels above the bottom of the bar '''
+    expected.flush()
+    actual.flush()
+    h = BAR_HEIGHT * SCALE
+    dx = WIDTH / float(nsegments)
+    dy = h / float(nsegments)
+    y = int(h + S / 2 - 3)
+    for i in range(1, nsegments):
+        if i * dy < 6:  # Too low to have a row above the bottom stroke
+            continue
+        x = i * dx + S
+        margin = min(dx, 12) / 2
+        x1 = max(int(x - margin), 0)
+        x2 = min(int(x + S / 2 + margin) + 1, WIDTH)
+        centre = _gap_centre(expected, y, x1, x2)
+        assert centre is not None, 'no gap %d in the SVG' % i
+        centre2 = _gap_centre(actual, y, x1, x2)
+        assert centre2 is not None, 'no gap %d' % i
+        assert abs(centre - centre2) < 1, \
+            'gap %d at x=%.1f, not x=%.1f' % (i, centre2, centre)
+
+
+@pytest.mark.parametrize('nsegments', [2, 3, 4, 5, 8, 12, 17, 36, 100])
+def test_bar_matches_svg(nsegments):
+    base = _render_base(WIDTH, SCALE)
+    expected = _rasterize(svg_wedge_bar(nsegments, WIDTH,
+                                        BAR_HEIGHT * SCALE))
+    actual = _render_bar(base, nsegments, WIDTH, SCALE)
+    _assert_similar(expected, actual)
+    _assert_gaps(expected, actual, nsegments)
+
+
+def test_mark_matches_svg():
+    _assert_similar(
+        _rasterize(svg_wedge_mark(BALL_SIZE, WIDTH, BAR_HEIGHT * SCALE)),
+        _render_mark(BALL_SIZE, WIDTH, SCALE))
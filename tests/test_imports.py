@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2026, FractionBounce contributors
+
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# You should have received a copy of the GNU General Public License
+# along with this library; if not, write to the Free Software
+# Foundation, 51 Franklin Street, Suite 500 Boston, MA 02110-1335 USA
+
+'''
+GStreamer, collaboration and the Sugar profile are started on first
+use, so importing the game must not import them.  The import times
+are captured with python -X importtime; run with -s to see the
+slowest imports.
+'''
+
+import os
+import subprocess
+import sys
+
+import pytest
+
+pytest.importorskip('gi')
+pytest.importorskip('sugar3')
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SLOWEST = 10
+
+
+def _import_times(module):
+    ''' Import module in a fresh interpreter and return the cumulative
+    import time, in microseconds, of every module it imported '''
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import ' + module],
+        cwd=ROOT, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+        universal_newlines=True)
+    assert result.returncode == 0, result.stderr
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        fields = line[len('import time:'):].split('|')
+        try:
+            times[fields[2].strip()] = int(fields[1])
+        except (IndexError, ValueError):  # The heading
+            continue
+    slowest = sorted(times.items(), key=lambda item: -item[1])[:SLOWEST]
+    print('import %s: %.1f ms' % (module, times.get(module, 0) / 1000.))
+    for name, us in slowest:
+        print('    %-40s %8.1f ms' % (name, us / 1000.))
+    return times
+
+
+@pytest.mark.parametrize('module', ['bounce', 'ball', 'aplay'])
+def test_no_gstreamer_or_collaboration(module):
+    times = _import_times(module)
+    assert module in times
+    for name in ('gi.repository.Gst', 'gi.repository.TelepathyGLib',
+                 'collabwrapper'):
+        assert name not in times
+
+
+def test_ball_leaves_profile():
+    assert 'sugar3.profile' not in _import_times('ball')
@@ -13,31 +13,228 @@
 # Foundation, 51 Franklin Street, Suite 500 Boston, MA 02110-1335 USA
 
 
-from gi.repository import Gtk
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 
-from sugar3.graphics.objectchooser import ObjectChooser
-try:
-    from sugar3.graphics.objectchooser import FILTER_TYPE_GENERIC_MIME
-except:
-    FILTER_TYPE_GENERIC_MIME = 'generic_mime'
+from gi.repository import GLib
 
+import logging
+_logger = logging.getLogger('fractionbounce-activity')
 
-def chooser(parent_window, filter, action):
-    """ Choose an object from the datastore and take some action """
-    chooser = None
+_executor = None  # started on first use
+_colors = None  # read from the Sugar profile on first use
+
+
+def get_colors():
+    """ Return the user's colors """
+    global _colors
+    if _colors is None:
+        from sugar3 import profile
+        color = profile.get_color()
+        if color is not None:
+            _colors = color.to_string().split(',')
+        else:
+            _colors = ['#A0FFA0', '#FF8080']
+    return _colors
+
+
+def run_async(func, args, callback, *user_data):
+    """ Call func(*args) in a worker thread and pass the result (None
+    if it failed) and user_data to callback on the main loop. func must
+    only read its arguments: it may not touch GTK, the sprites or
+    anything else the main loop changes. """
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=2)
+
+    def done(future):
+        try:
+            result = future.result()
+        except Exception as e:
+            _logger.error('%s failed: %s' % (func.__name__, e))
+            result = None
+        GLib.idle_add(_deliver, callback, result, user_data)
+
+    _executor.submit(func, *args).add_done_callback(done)
+
+
+def _deliver(callback, result, user_data):
+    callback(result, *user_data)
+    return False
+
+
+class LRUCache():
+    """ Rendered surfaces, least recently used first, limited to size
+    surfaces and/or budget bytes of pixels (but always keeping the last
+    one), which can also be filled in the background with prefill """
+
+    def __init__(self, size=None, budget=None):
+        self._surfaces = OrderedDict()
+        self._size = size
+        self._budget = budget
+        self._bytes = 0
+        self._pending = set()  # keys being rendered in the background
+        self._generation = 0  # bumped to drop what is being rendered
+
+    def __contains__(self, key):
+        return key in self._surfaces
+
+    def keys(self):
+        return list(self._surfaces.keys())
+
+    def get(self, key, render=None):
+        """ Return the surface for key, calling render() to make it if
+        it is not there (or returning None, without render) """
+        if key in self._surfaces:
+            self._surfaces.move_to_end(key)
+            return self._surfaces[key]
+        if render is None:
+            return None
+        return self.put(key, render())
+
+    def put(self, key, surface):
+        """ Add a surface, evicting the least recently used """
+        self.discard(key)
+        self._surfaces[key] = surface
+        self._bytes += _size_of(surface)
+        while len(self._surfaces) > 1 and self._full():
+            self._bytes -= _size_of(self._surfaces.popitem(last=False)[1])
+        return surface
+
+    def _full(self):
+        if self._size is not None and len(self._surfaces) > self._size:
+            return True
+        return self._budget is not None and self._bytes > self._budget
+
+    def discard(self, key):
+        if key in self._surfaces:
+            self._bytes -= _size_of(self._surfaces.pop(key))
+
+    def prefill(self, key, func, *args):
+        """ Unless it is there (or on its way), render the surface for
+        key in the background with func(*args) (see run_async) """
+        if key in self._surfaces or key in self._pending:
+            return
+        self._pending.add(key)
+        run_async(func, args, self._prefilled, self._generation, key)
+
+    def _prefilled(self, surface, generation, key):
+        if generation != self._generation:
+            return
+        self._pending.discard(key)
+        if surface is not None and key not in self._surfaces:
+            self.put(key, surface)
+
+    def drop_pending(self):
+        """ Drop the surfaces being rendered in the background when they
+        arrive (e.g., when the screen size they are for has changed) """
+        self._pending.clear()
+        self._generation += 1
+
+    def clear(self):
+        self._surfaces.clear()
+        self._bytes = 0
+        self.drop_pending()
+
+
+def _size_of(surface):
+    return surface.get_stride() * surface.get_height()
+
+
+def chooser(parent_window, filter, action, pause=None, resume=None):
+    """ Choose an object from the datastore and take some action. The
+    Journal shows its chooser and answers with a D-Bus signal, so this
+    returns at once and the main loop keeps running; pause and resume
+    (if given) are called before the chooser is shown and after it has
+    gone. """
+    if pause is not None:
+        pause()
     try:
-        chooser = ObjectChooser(parent=parent_window, what_filter=filter,
-                                filter_type=FILTER_TYPE_GENERIC_MIME,
-                                show_preview=True)
-    except:
-        chooser = ObjectChooser(parent=parent_window, what_filter=filter)
-    if chooser is not None:
+        _JournalChooser(parent_window, filter, action, resume)
+    except Exception as e:
+        _logger.error('Could not show the object chooser: %s' % e)
+        if resume is not None:
+            resume()
+
+
+J_DBUS_SERVICE = 'org.laptop.Journal'
+J_DBUS_INTERFACE = 'org.laptop.Journal'
+J_DBUS_PATH = '/org/laptop/Journal'
+
+
+class _JournalChooser():
+    """ What sugar3's ObjectChooser.run does, without its nested main
+    loop: ask the Journal to choose an object, and act on the
+    ObjectChooserResponse or ObjectChooserCancelled signal """
+
+    def __init__(self, parent_window, filter, action, resume):
+        import dbus
+        from dbus.mainloop.glib import DBusGMainLoop
+        self._action = action
+        self._resume = resume
+        self._chooser_id = None
+        self._early = []  # signals that came before the chooser id
+        bus = dbus.SessionBus(mainloop=DBusGMainLoop())
+        self._journal = dbus.Interface(
+            bus.get_object(J_DBUS_SERVICE, J_DBUS_PATH, introspect=False),
+            J_DBUS_INTERFACE)
+        self._matches = [
+            bus.add_signal_receiver(
+                self._name_owner_changed_cb, signal_name='NameOwnerChanged',
+                dbus_interface='org.freedesktop.DBus', arg0=J_DBUS_SERVICE),
+            self._journal.connect_to_signal('ObjectChooserResponse',
+                                            self._response_cb),
+            self._journal.connect_to_signal('ObjectChooserCancelled',
+                                            self._cancelled_cb)]
+        window = parent_window.get_window()
+        xid = window.get_xid() if window is not None else 0
+        # Older Journals do not know ChooseObjectWithFilter.
+        self._journal.ChooseObjectWithFilter(
+            xid, filter or '', 'generic_mime', True, signature='issb',
+            reply_handler=self._chooser_id_cb,
+            error_handler=lambda e: self._journal.ChooseObject(
+                xid, filter or '', signature='is',
+                reply_handler=self._chooser_id_cb,
+                error_handler=self._error_cb))
+
+    def _chooser_id_cb(self, chooser_id):
+        self._chooser_id = chooser_id
+        for callback, args in self._early:
+            callback(*args)
+
+    def _error_cb(self, e):
+        _logger.error('Could not show the object chooser: %s' % e)
+        self._done(None)
+
+    def _response_cb(self, chooser_id, object_id):
+        if self._chooser_id is None:
+            self._early.append((self._response_cb, (chooser_id, object_id)))
+        elif chooser_id == self._chooser_id:
+            self._done(object_id)
+
+    def _cancelled_cb(self, chooser_id):
+        if self._chooser_id is None:
+            self._early.append((self._cancelled_cb, (chooser_id,)))
+        elif chooser_id == self._chooser_id:
+            self._done(None)
+
+    def _name_owner_changed_cb(self, name, old, new):
+        if not new:  # The Journal has gone, and its chooser with it
+            self._done(None)
+
+    def _done(self, object_id):
+        for match in self._matches:
+            match.remove()
+        self._matches = []
         try:
-            result = chooser.run()
-            if result == Gtk.ResponseType.ACCEPT:
-                dsobject = chooser.get_selected_object()
-                action(dsobject)
-                dsobject.destroy()
+            if object_id is not None:
+                from sugar3.datastore import datastore
+                dsobject = datastore.get(object_id)
+                try:
+                    self._action(dsobject)
+                finally:
+                    dsobject.destroy()
         finally:
-            chooser.destroy()
-            del chooser
+            if self._resume is not None:
+                self._resume()
+                self._resume = None